@@ -0,0 +1,261 @@
+#!/usr/bin/python3
+
+"""
+A stand-in Jenkins server for benchmarks.
+
+Only the parts of the REST API pennyworth uses are implemented: the crumb
+issuer, paged job listings (including folders), reading and writing
+config.xml, creating jobs, and deleting them.  Every request can be delayed
+to simulate a remote server, and requests are counted so benchmarks can
+report how many a command made.
+
+It can be started from another script:
+
+    server = FakeJenkins(latency=0.02)
+    server.start()
+    ...
+    server.stop()
+
+or run on its own:
+
+    $ python3 benchmarks/fake_jenkins.py --port 8080 --latency 0.02
+"""
+
+import argparse
+import http.server
+import json
+import re
+import threading
+import time
+import urllib.parse
+
+_FOLDER_CLASS = "com.cloudbees.hudson.plugins.folder.Folder"
+_JOB_CLASS = "hudson.model.FreeStyleProject"
+
+_RANGE_PATTERN = re.compile(R"\{(\d*),(\d*)\}")
+
+
+def _split_path(path):
+    parts = [urllib.parse.unquote(part) for part in path.strip('/').split('/')
+             if part]
+    names = []
+    index = 0
+    while index + 1 < len(parts) and parts[index] == 'job':
+        names.append(parts[index + 1])
+        index += 2
+    return '/'.join(names), parts[index:]
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and bodies are written separately, so without this every
+    # response waits on a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        # pylint: disable=arguments-differ
+        pass
+
+    def _send(self, code, body=b'', content_type='text/plain'):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.jenkins.count(len(body))
+
+    def _job_url(self, name):
+        path = ''.join("/job/{}".format(urllib.parse.quote(part))
+                       for part in name.split('/') if part)
+        return "http://{}{}/".format(self.headers['Host'], path)
+
+    def _list(self, name, query):
+        jenkins = self.server.jenkins
+        with jenkins.lock:
+            if name and name not in jenkins.folders:
+                return self._send(404)
+            items = jenkins.children(name)
+        jobs = [{'name': child.rsplit('/', 1)[-1], 'url': self._job_url(child),
+                 '_class': (_FOLDER_CLASS if folder else _JOB_CLASS)}
+                for child, folder in items]
+        match = _RANGE_PATTERN.search(query.get('tree', [''])[0])
+        if match:
+            start = int(match.group(1) or 0)
+            end = int(match.group(2)) if match.group(2) else None
+            jobs = jobs[start:end]
+        return self._send(200, json.dumps({'jobs': jobs}), 'application/json')
+
+    def do_GET(self):
+        # pylint: disable=invalid-name,missing-docstring
+        time.sleep(self.server.jenkins.latency)
+        url = urllib.parse.urlparse(self.path)
+        name, rest = _split_path(url.path)
+        jenkins = self.server.jenkins
+        if rest[:1] == ['crumbIssuer']:
+            return self._send(200, json.dumps({
+                'crumbRequestField': 'Jenkins-Crumb', 'crumb': 'bench'}),
+                              'application/json')
+        if rest == ['config.xml']:
+            with jenkins.lock:
+                config = jenkins.jobs.get(name)
+            if config is None:
+                return self._send(404)
+            return self._send(200, config, 'application/xml')
+        if rest == ['api', 'json']:
+            return self._list(name, urllib.parse.parse_qs(url.query))
+        return self._send(404)
+
+    def do_POST(self):
+        # pylint: disable=invalid-name,missing-docstring
+        time.sleep(self.server.jenkins.latency)
+        url = urllib.parse.urlparse(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8')
+        name, rest = _split_path(url.path)
+        jenkins = self.server.jenkins
+        with jenkins.lock:
+            if rest == ['createItem']:
+                leaf = urllib.parse.parse_qs(url.query)['name'][0]
+                full = "{}/{}".format(name, leaf) if name else leaf
+                if full in jenkins.jobs or (name and
+                                            name not in jenkins.folders):
+                    return self._send(400)
+                jenkins.jobs[full] = body
+                return self._send(200)
+            if rest == ['config.xml']:
+                if name not in jenkins.jobs:
+                    return self._send(404)
+                jenkins.jobs[name] = body
+                return self._send(200)
+            if rest == ['doDelete']:
+                if name not in jenkins.jobs:
+                    return self._send(404)
+                del jenkins.jobs[name]
+                return self._send(302)
+        return self._send(404)
+
+
+class FakeJenkins:
+    """
+    A Jenkins stand-in running on a background thread.
+
+    Arguments:
+    latency - Seconds to wait before answering each request.
+    port - The port to listen on.  0 picks a free port.
+    """
+
+    def __init__(self, latency=0, port=0):
+        self.latency = latency
+        self.jobs = {}
+        self.folders = set()
+        self.lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._bytes = 0
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', port),
+                                                       _Handler)
+        self._server.daemon_threads = True
+        self._server.jenkins = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """The server's base URL."""
+        return "http://127.0.0.1:{}".format(self._server.server_address[1])
+
+    def count(self, size):
+        """Record a response of size bytes."""
+        with self._stats_lock:
+            self._requests += 1
+            self._bytes += size
+
+    def get_stats(self):
+        """
+        Retrieve request statistics.
+
+        Returns:
+        A dictionary with the number of requests answered and the number of
+        response body bytes sent.
+        """
+        with self._stats_lock:
+            return {'requests': self._requests, 'bytes': self._bytes}
+
+    def reset_stats(self):
+        """Start counting requests from zero."""
+        with self._stats_lock:
+            self._requests = 0
+            self._bytes = 0
+
+    def children(self, folder):
+        """
+        List the items directly inside a folder.
+
+        Arguments:
+        folder - The folder's path, or '' for the top level.
+
+        Returns:
+        A sorted list of tuples containing an item's path and whether it's a
+        folder.
+        """
+        prefix = "{}/".format(folder) if folder else ''
+        items = set()
+        for name in list(self.jobs) + list(self.folders):
+            if name.startswith(prefix):
+                rest = name[len(prefix):]
+                if rest:
+                    child = prefix + rest.split('/', 1)[0]
+                    items.add((child, child in self.folders))
+        return sorted(items)
+
+    def set_jobs(self, jobs):
+        """
+        Replace every job on the server.
+
+        Folders are created for any job with a slash in its name.
+
+        Arguments:
+        jobs - A dictionary mapping job names to configurations.
+        """
+        with self.lock:
+            self.jobs = dict(jobs)
+            self.folders = set()
+            for name in jobs:
+                parts = name.split('/')[:-1]
+                for index in range(1, len(parts) + 1):
+                    self.folders.add('/'.join(parts[:index]))
+
+    def start(self):
+        """Start answering requests."""
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop answering requests."""
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+def main(args=None):
+    # pylint: disable=missing-docstring
+    parser = argparse.ArgumentParser(description="Run a fake Jenkins server")
+    parser.add_argument("--port", type=int, default=8080,
+                        help="The port to listen on.")
+    parser.add_argument("--latency", type=float, default=0,
+                        help="Seconds to delay every request.")
+    parsed_args = parser.parse_args(args)
+    server = FakeJenkins(parsed_args.latency, parsed_args.port)
+    print("Listening on {}".format(server.url))
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/python3
+
+"""
+Measure how long the pennyworth CLI takes to start.
+
+Every scenario runs in a fresh interpreter several times, and the fastest and
+median wall times are reported.  Each scenario also checks that modules which
+are slow to import (requests and its dependencies, or pkg_resources) aren't
+loaded by commands that don't need them.
+
+Commands are found through their entry points, so pennyworth needs to be
+installed (pip3 install -e . works well for a checkout):
+
+    $ python3 benchmarks/startup.py
+    $ python3 benchmarks/startup.py --max-ms 250
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+_LIB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib")
+
+_SLOW_MODULES = ["requests", "urllib3", "pkg_resources"]
+
+# Each scenario runs the driver with the given arguments, then reports which
+# slow modules ended up imported.
+_SCENARIO_CODE = """
+import sys
+sys.argv = ['pennyworth'] + {args!r}
+import pennyworth.driver
+try:
+    pennyworth.driver.main()
+except SystemExit:
+    pass
+loaded = [name for name in {slow!r} if name in sys.modules]
+sys.stderr.write('LOADED ' + ','.join(loaded) + '\\n')
+"""
+
+SCENARIOS = {
+    "help": ["--help"],
+    "build-jobs-help": ["build-jobs", "--help"],
+    "validate-help": ["validate", "--help"],
+}
+
+
+def _run_once(args):
+    code = _SCENARIO_CODE.format(args=args, slow=_SLOW_MODULES)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [_LIB] + [path for path in [env.get("PYTHONPATH")] if path])
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            universal_newlines=True, check=False)
+    elapsed = time.perf_counter() - start
+    loaded = []
+    for line in result.stderr.splitlines():
+        if line.startswith("LOADED "):
+            loaded = [name for name in line[len("LOADED "):].split(',')
+                      if name]
+    return elapsed, loaded
+
+
+def measure(args, repeat):
+    """
+    Time one scenario.
+
+    Arguments:
+    args - The arguments to pass to the pennyworth driver.
+    repeat - How many times to run the scenario.
+
+    Returns:
+    A dictionary with the fastest and median times (in milliseconds) and the
+    slow modules that were imported.
+    """
+    times = []
+    loaded = set()
+    for _ in range(repeat):
+        elapsed, modules = _run_once(args)
+        times.append(elapsed * 1000)
+        loaded.update(modules)
+    return {
+        "min_ms": round(min(times), 2),
+        "median_ms": round(statistics.median(times), 2),
+        "slow_imports": sorted(loaded)
+    }
+
+
+def main(args=None):
+    # pylint: disable=missing-docstring
+    parser = argparse.ArgumentParser(
+        description="Measure pennyworth startup time")
+    parser.add_argument("--repeat", type=int, default=10,
+                        help="How many times to run each scenario.")
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="Fail if any scenario's median time exceeds "
+                             "this many milliseconds.")
+    parser.add_argument("--json", action="store_true",
+                        help="Print results as JSON.")
+    parsed_args = parser.parse_args(args)
+
+    results = {name: measure(scenario, parsed_args.repeat)
+               for name, scenario in SCENARIOS.items()}
+    if parsed_args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        for name, result in results.items():
+            print("{}: min {} ms, median {} ms{}".format(
+                name, result["min_ms"], result["median_ms"],
+                " (imported {})".format(", ".join(result["slow_imports"]))
+                if result["slow_imports"] else ""))
+
+    failed = False
+    for name, result in results.items():
+        if result["slow_imports"]:
+            print("{} imported {}".format(
+                name, ", ".join(result["slow_imports"])), file=sys.stderr)
+            failed = True
+        if parsed_args.max_ms is not None and \
+                result["median_ms"] > parsed_args.max_ms:
+            print("{} took {} ms (limit {} ms)".format(
+                name, result["median_ms"], parsed_args.max_ms),
+                file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
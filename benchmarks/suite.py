@@ -0,0 +1,272 @@
+#!/usr/bin/python3
+
+"""
+Benchmark job generation, comparison, startup, and talking to Jenkins.
+
+A synthetic configuration tree (see synth.py) is created in a temporary
+directory, then:
+  - generate: loading jobs.conf, generating every job (serially and with a
+    process pool), planning a sync with integrate.Plan, and computing
+    validate's diffs are timed in a separate interpreter, which also reports
+    its peak memory
+  - startup: CLI startup is timed the same way startup.py does it
+  - remote: list-jobs, validate, and sync are run against a local fake Jenkins
+    (see fake_jenkins.py) with optional latency, recording wall time and how
+    many requests each made
+
+Results are printed as JSON (or written with --output) so runs from different
+versions can be compared with --compare:
+
+    $ python3 benchmarks/suite.py --jobs 2000 --output before.json
+    $ python3 benchmarks/suite.py --jobs 2000 --compare before.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import fake_jenkins
+import startup
+import synth
+
+_LIB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib")
+
+_PHASES = ["generate", "startup", "remote"]
+
+
+def _environment(home):
+    env = dict(os.environ)
+    env["HOME"] = home
+    env["PYTHONPATH"] = os.pathsep.join(
+        [_LIB] + [path for path in [env.get("PYTHONPATH")] if path])
+    return env
+
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, round(time.perf_counter() - start, 4)
+
+
+def _perturb(configs, seed=0):
+    # What Jenkins might look like: most jobs match, some were edited, some
+    # are missing, and some only exist in Jenkins.
+    rng = random.Random(seed)
+    jenkins = {}
+    for name, config in configs.items():
+        roll = rng.random()
+        if roll < 0.05:
+            continue
+        if roll < 0.15:
+            config = config.replace("</project>",
+                                    "  <edited>true</edited>\n</project>")
+        jenkins[name] = config
+    for index in range(max(len(configs) // 20, 1)):
+        jenkins["stale{}".format(index)] = "<project/>"
+    return jenkins
+
+
+def _generate_worker(parsed_args):
+    # Runs in its own interpreter with HOME pointing at the tree, so paths
+    # and caches resolve inside it.
+    # pylint: disable=import-outside-toplevel
+    import resource
+
+    import pennyworth.integrate
+    import pennyworth.job_config
+    import pennyworth.normalize
+    import pennyworth.paths
+    import pennyworth.validate
+
+    shutil.rmtree(pennyworth.paths.get_cache_root(), ignore_errors=True)
+    results = {}
+    job_config, results["load_cold_s"] = _timed(
+        pennyworth.job_config.make_configs, "jobs.conf")
+    job_config, results["load_warm_s"] = _timed(
+        pennyworth.job_config.make_configs, "jobs.conf")
+    jobs = job_config.get_jobs()
+
+    configs, elapsed = _timed(pennyworth.job_config.generate_job_configs,
+                              job_config, jobs)
+    results["jobs"] = len(configs)
+    results["bytes"] = sum(len(config) for config in configs.values())
+    results["serial_s"] = elapsed
+    results["serial_jobs_per_s"] = round(len(configs) / elapsed, 1)
+    if parsed_args.processes > 1:
+        _, elapsed = _timed(pennyworth.job_config.generate_job_configs,
+                            job_config, jobs, None, False,
+                            parsed_args.processes)
+        results["parallel_s"] = elapsed
+        results["parallel_jobs_per_s"] = round(len(configs) / elapsed, 1)
+
+    jenkins = _perturb(configs)
+    _, results["plan_s"] = _timed(pennyworth.integrate.Plan, jenkins, configs)
+    _, results["plan_normalized_s"] = _timed(
+        pennyworth.integrate.Plan, jenkins, configs,
+        pennyworth.normalize.normalize_config)
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, results["diff_s"] = _timed(pennyworth.validate.print_diffs,
+                                      jenkins, configs)
+    results["peak_rss_kb"] = resource.getrusage(
+        resource.RUSAGE_SELF).ru_maxrss
+
+    if parsed_args.dump:
+        with open(parsed_args.dump, 'w') as dump_file:
+            json.dump(configs, dump_file)
+    print(json.dumps(results))
+
+
+def _run_generate(paths, processes, dump=None):
+    command = [sys.executable, os.path.abspath(__file__), "--worker",
+               "--processes", str(processes)]
+    if dump:
+        command += ["--dump", dump]
+    result = subprocess.run(command, cwd=paths['work'],
+                            env=_environment(paths['home']),
+                            stdout=subprocess.PIPE, universal_newlines=True,
+                            check=True)
+    return json.loads(result.stdout)
+
+
+def _run_command(paths, server, module, *args):
+    server.reset_stats()
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-m", "pennyworth.{}".format(module)] + list(args),
+        cwd=paths['work'], env=_environment(paths['home']),
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True, check=False)
+    elapsed = round(time.perf_counter() - start, 4)
+    measurement = {"wall_s": elapsed, "returncode": result.returncode}
+    measurement.update(server.get_stats())
+    return measurement
+
+
+def _run_remote(paths, parsed_args, configs):
+    server = fake_jenkins.FakeJenkins(parsed_args.latency)
+    server.set_jobs(_perturb(configs))
+    server.start()
+    try:
+        synth.write_hosts(paths['home'], server.url, parsed_args.workers)
+        return {
+            "list": _run_command(paths, server, "list_jobs"),
+            "validate": _run_command(paths, server, "validate", "--summary"),
+            "sync_dry_run": _run_command(paths, server, "sync", "--dry-run"),
+            "sync": _run_command(paths, server, "sync"),
+            "sync_unchanged": _run_command(paths, server, "sync"),
+        }
+    finally:
+        server.stop()
+
+
+def _flatten(results, prefix=""):
+    values = {}
+    for key, value in results.items():
+        name = "{}{}".format(prefix, key)
+        if isinstance(value, dict):
+            values.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and \
+                not isinstance(value, bool):
+            values[name] = value
+    return values
+
+
+def _print_comparison(old, new):
+    old_values = _flatten(old["results"])
+    new_values = _flatten(new["results"])
+    for name in sorted(set(old_values) & set(new_values)):
+        ratio = ""
+        if old_values[name]:
+            ratio = "{:.2f}x".format(new_values[name] / old_values[name])
+        print("{:45} {:>12} {:>12} {:>8}".format(
+            name, old_values[name], new_values[name], ratio))
+
+
+def main(args=None):
+    # pylint: disable=missing-docstring
+    parser = argparse.ArgumentParser(description="Benchmark pennyworth")
+    parser.add_argument("--jobs", type=int, default=1000,
+                        help="The number of jobs to generate.")
+    parser.add_argument("--templates", type=int, default=5,
+                        help="The number of templates.")
+    parser.add_argument("--chunk-lines", type=int, default=50,
+                        help="The number of lines in each chunk.")
+    parser.add_argument("--subs", type=int, default=5,
+                        help="The number of substitutions per job.")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(),
+                        help="The number of processes for parallel "
+                             "generation.")
+    parser.add_argument("--latency", type=float, default=0.005,
+                        help="Seconds the fake Jenkins delays each request.")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Concurrent requests allowed per host.")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="How many times to run each startup scenario.")
+    parser.add_argument("--skip", action="append", choices=_PHASES,
+                        default=[], help="Skip a phase.")
+    parser.add_argument("--output", help="Write results to this file.")
+    parser.add_argument("--compare",
+                        help="Compare results with a previous --output.")
+    parser.add_argument("--worker", action="store_true",
+                        help=argparse.SUPPRESS)
+    parser.add_argument("--dump", help=argparse.SUPPRESS)
+    parsed_args = parser.parse_args(args)
+
+    if parsed_args.worker:
+        _generate_worker(parsed_args)
+        return 0
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="pennyworth-bench") as root:
+        paths = synth.make_tree(root, jobs=parsed_args.jobs,
+                                templates=parsed_args.templates,
+                                chunk_lines=parsed_args.chunk_lines,
+                                subs=parsed_args.subs)
+        dump = os.path.join(root, "configs.json")
+        generated = _run_generate(paths, parsed_args.processes, dump)
+        if "generate" not in parsed_args.skip:
+            results["generate"] = generated
+        if "startup" not in parsed_args.skip:
+            results["startup"] = {
+                name: startup.measure(scenario, parsed_args.repeat)
+                for name, scenario in startup.SCENARIOS.items()}
+        if "remote" not in parsed_args.skip:
+            with open(dump) as dump_file:
+                configs = json.load(dump_file)
+            results["remote"] = _run_remote(paths, parsed_args, configs)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "parameters": {key: getattr(parsed_args, key) for key in [
+                "jobs", "templates", "chunk_lines", "subs", "processes",
+                "latency", "workers", "repeat"]}
+        },
+        "results": results
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if parsed_args.output:
+        with open(parsed_args.output, 'w') as output_file:
+            output_file.write(output + "\n")
+    if parsed_args.compare:
+        with open(parsed_args.compare) as compare_file:
+            _print_comparison(json.load(compare_file), report)
+    elif not parsed_args.output:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
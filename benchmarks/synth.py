@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+
+"""
+Create synthetic pennyworth configuration trees for benchmarks.
+
+A tree has two parts: a home directory holding ~/.pennyworth.d (templates and
+hosts.conf), and a work directory holding jobs.conf and its chunks.  Commands
+should run with HOME set to the first and the second as the working
+directory.
+
+Jobs are split between the chunks and template build methods.  Every chunk
+contains substitution tokens, and every job provides values for them.  The
+same seed always produces the same tree.
+
+    $ python3 benchmarks/synth.py /tmp/tree --jobs 5000
+"""
+
+import argparse
+import os
+import random
+
+_TEMPLATE_FOLDER = "bench"
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as output_file:
+        output_file.write(data)
+
+
+def _make_chunk(rng, lines, subs):
+    output = []
+    for line in range(lines):
+        if subs and line % max(lines // subs, 1) == 0:
+            output.append("  <value{}>@@SUB{}@@</value{}>".format(
+                line, rng.randrange(subs), line))
+        else:
+            output.append("  <setting{}>{}</setting{}>".format(
+                line, rng.getrandbits(64), line))
+    return "\n".join(output)
+
+
+def make_tree(root, jobs=1000, templates=5, template_ratio=0.5, chunks=20,
+              chunks_per_job=4, chunk_lines=50, subs=5, seed=0):
+    """
+    Create a configuration tree.
+
+    Arguments:
+    root - The directory to create the tree in.
+    jobs - The number of jobs.
+    templates - The number of templates.
+    template_ratio - The fraction of jobs built from a template.
+    chunks - The number of distinct chunk files jobs choose from.
+    chunks_per_job - The number of chunks in each job (and template).
+    chunk_lines - The number of lines in each chunk.
+    subs - The number of substitutions each job provides.
+    seed - The seed for the random number generator.
+
+    Returns:
+    A dictionary with 'home' and 'work' keys containing the directories
+    commands should use.
+    """
+    rng = random.Random(seed)
+    home = os.path.join(root, "home")
+    work = os.path.join(root, "work")
+    template_root = os.path.join(home, ".pennyworth.d", _TEMPLATE_FOLDER)
+
+    chunk_names = []
+    for index in range(chunks):
+        name = os.path.join("chunks", "chunk{}.xml".format(index))
+        _write(os.path.join(work, name), _make_chunk(rng, chunk_lines, subs))
+        chunk_names.append(name)
+    _write(os.path.join(work, "chunks", "head.xml"),
+           "<?xml version='1.1' encoding='UTF-8'?>\n<project>\n"
+           "  <description>@@DESCRIPTION@@</description>")
+    _write(os.path.join(work, "chunks", "tail.xml"), "</project>")
+
+    template_sections = []
+    for index in range(templates):
+        body = []
+        for part in range(chunks_per_job):
+            name = "t{}-{}.xml".format(index, part)
+            _write(os.path.join(template_root, name),
+                   _make_chunk(rng, chunk_lines, subs))
+            body.append(name)
+        template_sections.append("[t{}]\nchunks = {}\n".format(
+            index, ", ".join(["head.xml"] + body + ["tail.xml"])))
+    _write(os.path.join(template_root, "head.xml"),
+           "<?xml version='1.1' encoding='UTF-8'?>\n<project>\n"
+           "  <description>@@DESCRIPTION@@</description>")
+    _write(os.path.join(template_root, "tail.xml"), "</project>")
+    _write(os.path.join(template_root, "templates.conf"),
+           "\n".join(template_sections))
+
+    sections = ["[DEFAULT]\nhead = chunks/head.xml\ntail = chunks/tail.xml\n"]
+    for index in range(jobs):
+        lines = ["[job{}]".format(index)]
+        if templates and rng.random() < template_ratio:
+            lines.append("template = {}/t{}".format(
+                _TEMPLATE_FOLDER, rng.randrange(templates)))
+        else:
+            lines.append("chunks = ${{head}}, {}, ${{tail}}".format(
+                ", ".join(rng.sample(chunk_names,
+                                     min(chunks_per_job, chunks)))))
+        lines.append("sub.description = Job {}".format(index))
+        for sub in range(subs):
+            lines.append("sub.sub{} = value {} for job {}".format(
+                sub, rng.getrandbits(32), index))
+        sections.append("\n".join(lines) + "\n")
+    _write(os.path.join(work, "jobs.conf"), "\n".join(sections))
+    return {'home': home, 'work': work}
+
+
+def write_hosts(home, uri, workers=8):
+    """
+    Write a hosts.conf with a single host.
+
+    Arguments:
+    home - The tree's home directory.
+    uri - The Jenkins URI.
+    workers - The number of concurrent requests to allow.
+    """
+    _write(os.path.join(home, ".pennyworth.d", "hosts.conf"),
+           "[bench]\nuri = {}\nworkers = {}\n".format(uri, workers))
+
+
+def main(args=None):
+    # pylint: disable=missing-docstring
+    parser = argparse.ArgumentParser(
+        description="Create a synthetic configuration tree")
+    parser.add_argument("root", help="The directory to create the tree in.")
+    parser.add_argument("--jobs", type=int, default=1000,
+                        help="The number of jobs.")
+    parser.add_argument("--templates", type=int, default=5,
+                        help="The number of templates.")
+    parser.add_argument("--template-ratio", type=float, default=0.5,
+                        help="The fraction of jobs built from a template.")
+    parser.add_argument("--chunk-lines", type=int, default=50,
+                        help="The number of lines in each chunk.")
+    parser.add_argument("--subs", type=int, default=5,
+                        help="The number of substitutions per job.")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="The random seed.")
+    parsed_args = parser.parse_args(args)
+    paths = make_tree(parsed_args.root, jobs=parsed_args.jobs,
+                      templates=parsed_args.templates,
+                      template_ratio=parsed_args.template_ratio,
+                      chunk_lines=parsed_args.chunk_lines,
+                      subs=parsed_args.subs, seed=parsed_args.seed)
+    print("HOME={home} (run commands from {work})".format(**paths))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,354 @@
+#!/usr/bin/python3
+
+"""
+A Host that talks to Jenkins using asyncio.
+
+AsyncHost makes requests with aiohttp instead of requests.  A request in
+flight doesn't tie up a thread, so a host can allow hundreds or thousands of
+concurrent requests (bounded by its workers setting), and every AsyncHost
+shares a single event loop no matter how many hosts or folders a command
+works with.  Set backend = async in hosts.conf to use it.
+
+Every Host method works as usual from synchronous code: the call runs on the
+shared event loop (in a background thread) and waits for the result.
+Asynchronous code can await the *_async methods instead, on any event loop.
+"""
+
+import asyncio
+import atexit
+import importlib.util
+import json
+import threading
+
+import pennyworth.host
+import pennyworth.timings
+
+_LOOP = {
+    'loop': None,
+    'thread': None
+}
+_LOOP_LOCK = threading.Lock()
+
+# Every AsyncHost, so their sessions on the shared loop can be closed at exit.
+_HOSTS = set()
+
+
+def _import_aiohttp():
+    # aiohttp is optional and slow to import, so wait until a request is
+    # actually made.
+    # pylint: disable=import-outside-toplevel
+    import aiohttp
+
+    return aiohttp
+
+
+def _close_hosts():
+    loop = _LOOP['loop']
+    if loop is None:
+        return
+
+    async def _close():
+        await asyncio.gather(*[host.close_async() for host in list(_HOSTS)])
+
+    asyncio.run_coroutine_threadsafe(_close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    _LOOP['thread'].join()
+    loop.close()
+
+
+def _get_loop():
+    with _LOOP_LOCK:
+        if _LOOP['loop'] is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, daemon=True)
+            thread.start()
+            _LOOP['loop'] = loop
+            _LOOP['thread'] = thread
+            atexit.register(_close_hosts)
+        return _LOOP['loop']
+
+
+def run(coroutine):
+    """
+    Run a coroutine on the event loop shared by every AsyncHost.
+
+    This can be called from any thread except the shared loop's.
+
+    Arguments:
+    coroutine - The coroutine to run.
+
+    Returns:
+    What coroutine returned.  If it raised an exception, that exception is
+    raised instead.
+    """
+    loop = _get_loop()
+    if threading.current_thread() is _LOOP['thread']:
+        coroutine.close()
+        raise Exception("Can't wait on the AsyncHost event loop from inside "
+                        "it; await the *_async methods instead")
+    return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+
+class _Request:
+    # pylint: disable=too-few-public-methods
+    def __init__(self, method):
+        self.method = method
+
+
+class _Response:
+    # pylint: disable=too-few-public-methods
+    #
+    # The parts of a response HostError and callers use, since aiohttp's
+    # responses can't be used once their connection is released.
+    def __init__(self, method, url, status_code, text):
+        self.request = _Request(method)
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class _LoopState:
+    # pylint: disable=too-few-public-methods
+    #
+    # aiohttp sessions and asyncio primitives belong to a single event loop,
+    # so an AsyncHost keeps a set per loop it's used on.
+    def __init__(self, session, workers):
+        self.session = session
+        self.semaphore = asyncio.Semaphore(workers)
+        self.crumb_lock = asyncio.Lock()
+        self.crumb = None
+
+
+class AsyncHost(pennyworth.host.Host):
+    """
+    A Jenkins host to operate on using asyncio.
+
+    Arguments are the same as Host.  At most workers requests are in flight
+    at once on each event loop, over at most pool_size connections.
+    """
+
+    def __init__(self, *args, **kwargs):
+        if importlib.util.find_spec('aiohttp') is None:
+            raise Exception("The async backend requires aiohttp (try "
+                            "pip3 install aiohttp)")
+        super().__init__(*args, **kwargs)
+        self._states = {}
+        _HOSTS.add(self)
+
+    def _get_state(self):
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            aiohttp = _import_aiohttp()
+            auth = None
+            if self._auth:
+                auth = aiohttp.BasicAuth(*self._auth)
+            session = aiohttp.ClientSession(
+                auth=auth,
+                connector=aiohttp.TCPConnector(limit=self._pool_size,
+                                               ssl=self._ssl_verify),
+                timeout=aiohttp.ClientTimeout(total=self._timeout))
+            state = _LoopState(session, self._workers)
+            self._states[loop] = state
+        return state
+
+    async def _request(self, method, url, valid=(200,), **kwargs):
+        aiohttp = _import_aiohttp()
+        state = self._get_state()
+        async with state.semaphore:
+            try:
+                async with state.session.request(method, url,
+                                                 **kwargs) as response:
+                    body = await response.read()
+                    result = _Response(
+                        method, str(response.url), response.status,
+                        body.decode(response.get_encoding()))
+            except aiohttp.ClientConnectionError as failure:
+                raise ConnectionError(
+                    "{} {} failed: {}".format(method, url, failure)) \
+                    from failure
+            except asyncio.TimeoutError as failure:
+                raise TimeoutError(
+                    "{} {} timed out".format(method, url)) from failure
+        if pennyworth.timings.enabled():
+            pennyworth.timings.count("http.requests")
+            pennyworth.timings.count("http.bytes_received", len(body))
+            if kwargs.get('data'):
+                pennyworth.timings.count("http.bytes_sent",
+                                         len(kwargs['data']))
+        if result.status_code not in valid:
+            raise pennyworth.host.HostError(result)
+        return result
+
+    async def _get_crumb_async(self, stale=None):
+        state = self._get_state()
+        async with state.crumb_lock:
+            if state.crumb is None or state.crumb is stale:
+                response = await self._request(
+                    'GET', "{}/crumbIssuer/api/json".format(self._root_url),
+                    valid=(200, 404))
+                if response.status_code == 404:
+                    # CSRF protection is disabled
+                    state.crumb = {}
+                else:
+                    data = response.json()
+                    state.crumb = {data['crumbRequestField']: data['crumb']}
+            return state.crumb
+
+    async def _post_async(self, url, valid=(200,), headers=None, **kwargs):
+        crumb = await self._get_crumb_async()
+        try:
+            return await self._request(
+                'POST', url, valid, headers={**(headers or {}), **crumb},
+                **kwargs)
+        except pennyworth.host.HostError as failure:
+            if failure.response.status_code != 403 or not crumb:
+                raise
+        # crumbs expire along with the session they were issued to
+        crumb = await self._get_crumb_async(crumb)
+        return await self._request(
+            'POST', url, valid, headers={**(headers or {}), **crumb},
+            **kwargs)
+
+    async def _post_xml_async(self, url, xml, **kwargs):
+        return await self._post_async(
+            url, data=xml.encode('utf-8'),
+            headers={'Content-Type': 'text/xml'}, **kwargs)
+
+    async def _list_items_async(self, folder):
+        items = []
+        seen = set()
+        page = 0
+        while True:
+            url, params = self._list_request(folder, page)
+            response = await self._request('GET', url, params=params)
+            if not self._read_list_page(response.json(), items, seen):
+                return items
+            page += 1
+
+    async def _crawl_async(self, folder=''):
+        names = []
+        nested = []
+        prefix = folder + '/' if folder else ''
+        for name, is_folder in await self._list_items_async(folder):
+            if is_folder:
+                nested.append(self._crawl_async(prefix + name))
+            else:
+                names.append(prefix + name)
+        for nested_names in await asyncio.gather(*nested):
+            names.extend(nested_names)
+        return names
+
+    async def list_job_names_async(self, recursive=False):
+        """
+        Retrieve the names of jobs configured on the Host.
+
+        Every folder is listed at once when recursive is True.  Otherwise the
+        same as Host.list_job_names.
+        """
+        if recursive:
+            return await self._crawl_async()
+        return [name for name, _ in await self._list_items_async('')]
+
+    async def get_job_config_async(self, name):
+        """
+        Retrieve a job's configuration.
+
+        The same as Host.get_job_config.
+        """
+        response = await self._request(
+            'GET', "{}/config.xml".format(self._job_url(name)))
+        return response.text
+
+    async def get_job_configs_async(self, names, missing_ok=False):
+        """
+        Retrieve several jobs' configurations.
+
+        Every request is started at once, and the Host's limit on concurrent
+        requests decides how many are actually in flight.  Otherwise the same
+        as Host.get_job_configs.
+        """
+        # pylint: disable=broad-except
+        async def _fetch(name):
+            try:
+                return await self.get_job_config_async(name), None
+            except pennyworth.host.HostError as failure:
+                if missing_ok and failure.response.status_code == 404:
+                    return None, None
+                return None, failure
+            except Exception as failure:
+                return None, failure
+
+        outcomes = await asyncio.gather(*[_fetch(name) for name in names])
+        job_configs = {}
+        failures = {}
+        for name, (config, failure) in zip(names, outcomes):
+            if failure is not None:
+                failures[name] = failure
+            elif config is not None:
+                job_configs[name] = config
+        return job_configs, failures
+
+    async def change_job_async(self, name, xml):
+        """
+        Change a job's configuration on a host.
+
+        The same as Host.change_job.
+        """
+        self._discard_cached(name)
+        await self._post_xml_async(
+            "{}/config.xml".format(self._job_url(name)), xml)
+
+    async def create_job_async(self, name, xml):
+        """
+        Create a new job on the host.
+
+        The same as Host.create_job.
+        """
+        self._discard_cached(name)
+        folder, _, leaf = name.rpartition('/')
+        await self._post_xml_async(
+            "{}/createItem".format(self._job_url(folder)), xml,
+            params={'name': leaf})
+
+    async def erase_job_async(self, name):
+        """
+        Remove a job from the host.
+
+        The same as Host.erase_job.
+        """
+        self._discard_cached(name)
+        await self._post_async("{}/doDelete".format(self._job_url(name)),
+                               valid=(200, 302), allow_redirects=False)
+
+    async def close_async(self):
+        """Close the Host's connections on the running event loop."""
+        state = self._states.pop(asyncio.get_running_loop(), None)
+        if state:
+            await state.session.close()
+
+    @pennyworth.timings.timed("list jobs")
+    def list_job_names(self, recursive=False):
+        return run(self.list_job_names_async(recursive))
+
+    @pennyworth.timings.timed("fetch job")
+    def get_job_config(self, name):
+        return run(self.get_job_config_async(name))
+
+    def get_job_configs(self, names, missing_ok=False):
+        return run(self.get_job_configs_async(names, missing_ok))
+
+    @pennyworth.timings.timed("update job")
+    def change_job(self, name, xml):
+        run(self.change_job_async(name, xml))
+
+    @pennyworth.timings.timed("create job")
+    def create_job(self, name, xml):
+        run(self.create_job_async(name, xml))
+
+    @pennyworth.timings.timed("erase job")
+    def erase_job(self, name):
+        run(self.erase_job_async(name))
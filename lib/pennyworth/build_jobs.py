@@ -2,27 +2,31 @@
 
 """Code to support the build-jobs command."""
 
-import argparse
+import gzip
+import os.path
 
+import pennyworth.build_store
 import pennyworth.command
+import pennyworth.config
 import pennyworth.job_config
 
 
-def _verify_legal_jobs(requested, available):
-    for job in requested:
-        if job not in available:
-            raise Exception("{} is not a valid job".format(job))
+def _print_config(name, config):
+    print(name)
+    print('-' * len(name))
+    print(config)
 
 
-def _generate_configs(job_config, jobs):
-    generated_configs = {}
-    chunk_cache = pennyworth.job_config.ChunkCache()
-    for job in jobs:
-        config = pennyworth.job_config.build_config(
-            job_config.get_job_chunks(job), chunk_cache,
-            job_config.get_job_subs(job))
-        generated_configs[job] = config
-    return generated_configs
+def _make_writer(output_dir, compress):
+    def _write_config(name, config):
+        path = os.path.join(output_dir, name, "config.xml")
+        data = config
+        if compress:
+            path += ".gz"
+            data = gzip.compress(config.encode('utf-8'), mtime=0)
+        pennyworth.config.write_atomically(path, data)
+
+    return _write_config
 
 
 class BuildJobsCommand(pennyworth.command.Command):
@@ -33,8 +37,16 @@ class BuildJobsCommand(pennyworth.command.Command):
     def __init__(self):
         super().__init__(prog="pennyworth build-jobs",
                          description="Build job configurations")
-        self.add_argument("jobs", nargs="*", default=argparse.SUPPRESS,
-                          help="The jobs to generate")
+        pennyworth.command.add_job_filters(self)
+        pennyworth.command.add_incremental_argument(self)
+        pennyworth.command.add_strict_argument(self)
+        pennyworth.command.add_processes_argument(self)
+        self.add_argument("--output-dir",
+                          default=None,
+                          help="Write each job to <output-dir>/<job>/"
+                               "config.xml instead of standard out.")
+        self.add_argument("--gzip", action="store_true",
+                          help="Compress files written to --output-dir.")
 
     def process(self, parsed_args):
         """
@@ -45,16 +57,25 @@ class BuildJobsCommand(pennyworth.command.Command):
         """
         job_config = pennyworth.job_config.make_configs('jobs.conf')
         available_jobs = job_config.get_jobs()
-        if 'jobs' in parsed_args:
-            _verify_legal_jobs(parsed_args.jobs, available_jobs)
-            jobs = parsed_args.jobs
-        else:
-            jobs = job_config.get_jobs()
-        generated_configs = _generate_configs(job_config, jobs)
-        for name, config in generated_configs.items():
-            print(name)
-            print('-' * len(name))
-            print(config)
+        jobs = available_jobs
+        selector = pennyworth.command.make_job_selector(parsed_args)
+        if selector:
+            jobs = selector(job_config)
+        store = None
+        if parsed_args.incremental:
+            store = pennyworth.build_store.make_store('jobs.conf')
+        output = _print_config
+        if parsed_args.output_dir:
+            output = _make_writer(parsed_args.output_dir, parsed_args.gzip)
+        elif parsed_args.gzip:
+            raise Exception("--gzip requires --output-dir")
+        generated_configs = pennyworth.job_config.iter_job_configs(
+            job_config, jobs, store, parsed_args.strict,
+            parsed_args.processes)
+        for name, config in generated_configs:
+            output(name, config)
+        if store:
+            store.save(available_jobs)
 
 
 def main(args=None):
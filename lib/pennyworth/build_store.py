@@ -0,0 +1,168 @@
+#!/usr/bin/python3
+
+"""
+Keep generated job configurations between runs.
+
+A manifest records, for every job, a digest of everything that went into
+generating it: the job's options from jobs.conf (which include its template
+and substitutions), the chunk files it was built from, and the contents of
+those chunks.  If a job's digest hasn't changed since the last run, the
+previously generated configuration is reused instead of being built again.
+
+Chunk contents are hashed at most once per change; the manifest remembers each
+chunk's modification time and size so unchanged chunks don't need to be read.
+"""
+
+import hashlib
+import json
+import os
+
+import pennyworth.config
+import pennyworth.paths
+
+# Bump this whenever the manifest layout or the way configurations are
+# generated changes, so old manifests are ignored.
+_MANIFEST_VERSION = 3
+
+
+class BuildStore:
+    """
+    An on-disk store of generated configurations.
+
+    Arguments:
+    folder - The directory holding the manifest and generated configurations.
+    """
+
+    def __init__(self, folder):
+        self._folder = folder
+        self._files = {}
+        self._jobs = {}
+        try:
+            with open(self._manifest_path()) as manifest_file:
+                manifest = json.load(manifest_file)
+            if manifest.get('version') == _MANIFEST_VERSION:
+                self._files = manifest.get('files', {})
+                self._jobs = manifest.get('jobs', {})
+        except (OSError, ValueError):
+            pass
+
+    def _manifest_path(self):
+        return os.path.join(self._folder, "manifest.json")
+
+    def _output_path(self, digest):
+        return os.path.join(self._folder, "{}.xml".format(digest))
+
+    def file_digest(self, path):
+        """
+        Retrieve a digest of a file's contents.
+
+        Arguments:
+        path - The file to hash.
+
+        Returns:
+        A hex digest of path's contents.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        entry = self._files.get(path)
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2]
+        with open(path, 'rb') as input_file:
+            digest = hashlib.sha256(input_file.read()).hexdigest()
+        self._files[path] = [stat.st_mtime_ns, stat.st_size, digest]
+        return digest
+
+    def job_digest(self, options, chunks):
+        """
+        Compute a digest of a job's inputs.
+
+        Arguments:
+        options - The job's options from jobs.conf as a dictionary.
+        chunks - A list of the chunk files the job is built from.
+
+        Returns:
+        A hex digest that changes if any input to the job changes.
+        """
+        inputs = {
+            'options': sorted(options.items()),
+            'chunks': [(chunk, self.file_digest(chunk)) for chunk in chunks]
+        }
+        return hashlib.sha256(
+            json.dumps(inputs).encode('utf-8')).hexdigest()
+
+    def get(self, job, digest):
+        """
+        Retrieve a previously generated configuration.
+
+        Arguments:
+        job - The job's name.
+        digest - The job's current digest from job_digest.
+
+        Returns:
+        None if the job's inputs changed or it was never stored.  Otherwise a
+        tuple of the stored configuration and the list of substitution tokens
+        that were left unresolved when it was generated.
+        """
+        entry = self._jobs.get(job)
+        if not entry or entry['digest'] != digest:
+            return None
+        try:
+            with open(self._output_path(digest)) as output_file:
+                return output_file.read(), entry['unresolved']
+        except OSError:
+            return None
+
+    def set(self, job, digest, config, unresolved=()):
+        """
+        Store a generated configuration.
+
+        Arguments:
+        job - The job's name.
+        digest - The job's digest from job_digest.
+        config - The generated configuration.
+        unresolved - The substitution tokens config left unresolved.
+        """
+        if not os.path.exists(self._output_path(digest)):
+            pennyworth.config.write_atomically(
+                self._output_path(digest), config)
+        self._jobs[job] = {'digest': digest, 'unresolved': list(unresolved)}
+
+    def save(self, jobs=None):
+        """
+        Write the manifest and remove configurations nothing refers to.
+
+        Arguments:
+        jobs - If provided, the jobs that still exist.  Anything else is
+               dropped from the manifest.
+        """
+        if jobs is not None:
+            jobs = set(jobs)
+            self._jobs = {job: entry for job, entry in self._jobs.items()
+                          if job in jobs}
+        self._files = {path: entry for path, entry in self._files.items()
+                       if os.path.exists(path)}
+        pennyworth.config.write_atomically(
+            self._manifest_path(),
+            json.dumps({'version': _MANIFEST_VERSION, 'files': self._files,
+                        'jobs': self._jobs}, indent=1, sort_keys=True))
+        used = set("{}.xml".format(entry['digest'])
+                   for entry in self._jobs.values())
+        for entry in os.listdir(self._folder):
+            if entry.endswith(".xml") and entry not in used:
+                os.unlink(os.path.join(self._folder, entry))
+
+
+def make_store(config_path):
+    """
+    Create a BuildStore for a job configuration file.
+
+    Arguments:
+    config_path - Filesystem path to a job configuration file.
+
+    Returns:
+    A BuildStore specific to config_path.
+    """
+    key = hashlib.sha256(
+        os.path.abspath(config_path).encode('utf-8')).hexdigest()
+    return BuildStore(
+        os.path.join(pennyworth.paths.get_cache_root(), "build", key))
@@ -1,10 +1,13 @@
 #!/usr/bin/python3
 
 import argparse
+import concurrent.futures
 import errno
 import sys
 
 import pennyworth.host
+import pennyworth.job_filter
+import pennyworth.timings
 
 
 class Command:
@@ -12,18 +15,139 @@ class Command:
         self.parser = argparse.ArgumentParser(
             formatter_class=argparse.ArgumentDefaultsHelpFormatter,
             *args, **kwargs)
+        self.add_argument("--timings", action="store_true",
+                          help="Print how long each phase took, how many "
+                               "HTTP requests were made, and cache hit "
+                               "rates to standard error.  Also enabled by "
+                               "setting {}.".format(
+                                   pennyworth.timings.TIMINGS_VARIABLE))
+        self.add_argument("--profile", metavar="FILE",
+                          help="Write cProfile statistics to FILE.  Also "
+                               "enabled by setting {}.".format(
+                                   pennyworth.timings.PROFILE_VARIABLE))
 
     def add_argument(self, *args, **kwargs):
         self.parser.add_argument(*args, **kwargs)
 
     def execute(self, *args, **kwargs):
         parsed_args = self.parser.parse_args(*args, **kwargs)
-        self.process(parsed_args)
+        with pennyworth.timings.instrument(self.parser.prog,
+                                           parsed_args.timings,
+                                           parsed_args.profile):
+            self.process(parsed_args)
 
     def process(self, parsed_args):
         pass
 
 
+def add_job_filters(command):
+    """
+    Add arguments to select which jobs a command operates on.
+
+    Arguments:
+    command - The Command to add arguments to.
+    """
+    command.add_argument("jobs", nargs="*", default=argparse.SUPPRESS,
+                         help="The jobs to operate on.  Each can be a job "
+                              "name, a glob, or a regular expression "
+                              "prefixed with re:.  If no jobs, templates, or "
+                              "chunks are given, every job is used.")
+    command.add_argument("--template", dest="templates", action="append",
+                         metavar="TEMPLATE", default=[],
+                         help="Operate on jobs built from TEMPLATE.  Can be "
+                              "given more than once.")
+    command.add_argument("--chunk", dest="chunks", action="append",
+                         metavar="CHUNK", default=[],
+                         help="Operate on jobs built from the chunk file "
+                              "CHUNK.  Can be given more than once.")
+
+
+def _positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(
+            "{} is not a positive integer".format(value))
+    return number
+
+
+def add_processes_argument(command, action="generate jobs"):
+    """
+    Add a -j/--jobs argument for the number of processes to use.
+
+    The value is stored as processes and must be at least one.
+
+    Arguments:
+    command - The Command to add the argument to.
+    action - What the processes are used for, for the help text.
+    """
+    command.add_argument("-j", "--jobs", dest="processes", metavar="N",
+                         type=_positive_int, default=1,
+                         help="The number of processes to {} with.".format(
+                             action))
+
+
+def add_refresh_argument(command):
+    """
+    Add a --refresh argument to ignore cached job configurations.
+
+    Arguments:
+    command - The Command to add the argument to.
+    """
+    command.add_argument("--refresh", action="store_true",
+                         help="Ignore cached job configurations and fetch "
+                              "everything from Jenkins.")
+
+
+def add_incremental_argument(command):
+    """
+    Add an --incremental argument to reuse previously generated jobs.
+
+    Arguments:
+    command - The Command to add the argument to.
+    """
+    command.add_argument("--incremental", action="store_true",
+                         help="Reuse configurations from previous runs for "
+                              "jobs whose inputs haven't changed.")
+
+
+def add_strict_argument(command):
+    """
+    Add a --strict argument to fail on unresolved substitutions.
+
+    Arguments:
+    command - The Command to add the argument to.
+    """
+    command.add_argument("--strict", action="store_true",
+                         help="Fail if a job has @@NAME@@ tokens without a "
+                              "substitution.")
+
+
+def make_job_selector(parsed_args):
+    """
+    Make a function that selects the jobs requested on the command line.
+
+    Arguments:
+    parsed_args - Parsed command-line arguments from a command that used
+                  add_job_filters.
+
+    Returns:
+    None if no filters were given.  Otherwise a function that takes a
+    JobConfigs instance and returns the names of the selected jobs.
+    """
+    patterns = getattr(parsed_args, 'jobs', [])
+    if not (patterns or parsed_args.templates or parsed_args.chunks):
+        return None
+
+    def _select(job_config):
+        return pennyworth.job_filter.select_jobs(
+            job_config, patterns, parsed_args.templates, parsed_args.chunks)
+
+    return _select
+
+
 def _get_host(host):
     host_list = pennyworth.host.get_hosts()
     if host_list:
@@ -35,17 +159,72 @@ def _get_host(host):
     raise Exception("No hosts in listed")
 
 
+def _get_named_hosts(hosts, all_hosts):
+    if all_hosts:
+        host_list = pennyworth.host.get_hosts()
+        if host_list.sections():
+            return [host_list[host] for host in host_list.sections()]
+        raise Exception("No hosts in listed")
+    if hosts:
+        # drop duplicates but keep the order hosts were given in
+        return [_get_host(host) for host in dict.fromkeys(hosts)]
+    return [_get_host(None)]
+
+
+def run_on_hosts(hosts, function):
+    """
+    Run a function against several hosts at once.
+
+    Arguments:
+    hosts - A list of tuples containing a host name and a Host.
+    function - A function that takes a Host.
+
+    Returns:
+    A list of tuples in the same order as hosts, containing 1) the host name,
+    2) what function returned (None if it failed), and 3) the exception
+    function raised (None if it succeeded).
+    """
+    outcomes = []
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(len(hosts), 1)) as pool:
+        futures = [(name, pool.submit(function, host))
+                   for name, host in hosts]
+        for name, future in futures:
+            try:
+                outcomes.append((name, future.result(), None))
+            except Exception as failure:  # pylint: disable=broad-except
+                outcomes.append((name, None, failure))
+    return outcomes
+
+
 class HostCommand(Command):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, multiple_hosts=False, **kwargs):
         super().__init__(*args, **kwargs)
-        self.add_argument("--host",
-                          default=argparse.SUPPRESS,
-                          help="The host to use.  If unspecified, the first "
-                               "host listed in the host configuration file "
-                               "will be used.")
+        if multiple_hosts:
+            hosts = self.parser.add_mutually_exclusive_group()
+            hosts.add_argument("--host",
+                               action="append",
+                               default=argparse.SUPPRESS,
+                               help="A host to use.  Can be given more than "
+                                    "once to operate on several hosts.  If "
+                                    "unspecified, the first host listed in "
+                                    "the host configuration file will be "
+                                    "used.")
+            hosts.add_argument("--all-hosts", action="store_true",
+                               help="Use every host in the host "
+                                    "configuration file.")
+        else:
+            self.add_argument("--host",
+                              default=argparse.SUPPRESS,
+                              help="The host to use.  If unspecified, the "
+                                   "first host listed in the host "
+                                   "configuration file will be used.")
         self.add_argument("--folder",
                           default=None,
                           help="The folder to operate in.")
+        self.add_argument("--recursive", action="store_true",
+                          help="Include jobs in nested folders, named by "
+                               "their path relative to --folder.")
 
     @staticmethod
     def make_host(parsed_args):
@@ -53,7 +232,30 @@ class HostCommand(Command):
         if 'host' in parsed_args:
             hostname = parsed_args.host
         host = _get_host(hostname)
-        return pennyworth.host.make_host(host, parsed_args.folder)
+        return pennyworth.host.make_host(
+            host, parsed_args.folder, getattr(parsed_args, 'refresh', False))
+
+    @staticmethod
+    def make_hosts(parsed_args):
+        """
+        Make a Host for every host requested on the command line.
+
+        Arguments
+        parsed_args - Parsed command-line arguments
+
+        Returns:
+        A list of tuples containing the host name and its Host.
+        """
+        hostnames = None
+        if 'host' in parsed_args:
+            hostnames = parsed_args.host
+        host_configs = _get_named_hosts(
+            hostnames, getattr(parsed_args, 'all_hosts', False))
+        return [(host_config.name,
+                 pennyworth.host.make_host(
+                     host_config, parsed_args.folder,
+                     getattr(parsed_args, 'refresh', False)))
+                for host_config in host_configs]
 
     def process(self, parsed_args):
         pass
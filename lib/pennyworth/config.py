@@ -3,6 +3,8 @@
 """Manage reading configurations from disk."""
 
 import configparser
+import os
+import tempfile
 
 
 def _make_parser():
@@ -32,3 +34,45 @@ def write_config(config, path):
     """
     with open(path, 'w') as output_file:
         config.write(output_file)
+
+
+def file_signature(path):
+    """
+    Retrieve a cheap signature of a file that changes when the file does.
+
+    Arguments
+    path -- the file to check
+
+    Returns:
+    A tuple of the file's modification time and size, or None if the file
+    doesn't exist.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def write_atomically(path, data):
+    """
+    Write a file so readers never see it partially written.
+
+    The data is written to a temporary file in the same directory, which is
+    then renamed over path.  Missing parent directories are created.
+
+    Arguments
+    path -- the location to write
+    data -- the contents of the file, either str or bytes
+    """
+    folder = os.path.dirname(path) or '.'
+    os.makedirs(folder, exist_ok=True)
+    mode = 'wb' if isinstance(data, bytes) else 'w'
+    handle, temp_path = tempfile.mkstemp(dir=folder, prefix='.tmp')
+    try:
+        with os.fdopen(handle, mode) as output_file:
+            output_file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
@@ -0,0 +1,151 @@
+#!/usr/bin/python3
+
+"""
+A persistent cache of job configurations retrieved from Jenkins hosts.
+
+Each host/folder pair gets its own directory under the cache root containing
+an index and one file per job.  The index records a hash of every cached
+configuration (so damaged entries are ignored) and when it was fetched.
+
+Jenkins doesn't provide validators (ETag or Last-Modified) for job
+configurations, so entries are trusted until they reach a maximum age.  Jobs
+that pennyworth changes are dropped from the cache so the next run sees what
+Jenkins actually stored.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import pennyworth.config
+import pennyworth.paths
+
+
+def _hash(data):
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class ConfigCache:
+    """
+    Cached job configurations for a single host/folder.
+
+    Arguments:
+    folder - The directory to store cached configurations in.
+    max_age - How long (in seconds) a cached configuration is trusted.
+    refresh - If True, ignore existing entries and fetch everything again.
+    """
+
+    def __init__(self, folder, max_age, refresh=False):
+        self._folder = folder
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._index = {}
+        if not refresh:
+            self._index = self._load_index()
+
+    def _index_path(self):
+        return os.path.join(self._folder, "index.json")
+
+    def _job_path(self, name):
+        return os.path.join(self._folder, "{}.xml".format(_hash(name)))
+
+    def _load_index(self):
+        try:
+            with open(self._index_path()) as index_file:
+                return json.load(index_file).get('jobs', {})
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, name):
+        """
+        Retrieve a cached configuration.
+
+        Arguments:
+        name - The job to look up.
+
+        Returns:
+        The job's configuration, or None if it isn't cached or the cached copy
+        is too old.
+        """
+        with self._lock:
+            entry = self._index.get(name)
+        if not entry or time.time() - entry['fetched'] > self._max_age:
+            return None
+        try:
+            with open(self._job_path(name)) as job_file:
+                config = job_file.read()
+        except OSError:
+            return None
+        if _hash(config) != entry['sha256']:
+            return None
+        return config
+
+    def set(self, name, config):
+        """
+        Cache a job's configuration.
+
+        Arguments:
+        name - The job being cached.
+        config - The job's configuration as retrieved from Jenkins.
+        """
+        pennyworth.config.write_atomically(self._job_path(name), config)
+        with self._lock:
+            self._index[name] = {
+                'sha256': _hash(config),
+                'fetched': time.time()
+            }
+
+    def discard(self, name):
+        """
+        Remove a job from the cache.
+
+        Arguments:
+        name - The job to remove.
+        """
+        with self._lock:
+            self._index.pop(name, None)
+        try:
+            os.unlink(self._job_path(name))
+        except OSError:
+            pass
+
+    def evict(self, names):
+        """
+        Remove every job that isn't in names.
+
+        Arguments:
+        names - The jobs that still exist.
+        """
+        with self._lock:
+            stale = [name for name in self._index if name not in names]
+        for name in stale:
+            self.discard(name)
+
+    def save(self):
+        """Write the cache index to disk."""
+        with self._lock:
+            data = json.dumps({'jobs': self._index}, indent=1, sort_keys=True)
+        pennyworth.config.write_atomically(self._index_path(), data)
+
+
+def make_cache(host_name, folders, max_age, refresh=False):
+    """
+    Create a ConfigCache for a host and folder.
+
+    Arguments:
+    host_name - The name of the host in hosts.conf.
+    folders - A list of folder names leading to the folder being operated on.
+    max_age - How long (in seconds) a cached configuration is trusted.
+    refresh - If True, ignore any cached configurations.
+    """
+    # Mirror Jenkins' URL layout so folder names can't collide with the
+    # files the cache writes.
+    parts = []
+    for folder in folders:
+        parts.extend(['job', folder])
+    return ConfigCache(
+        os.path.join(pennyworth.paths.get_cache_root(), "hosts", host_name,
+                     *parts),
+        max_age, refresh)
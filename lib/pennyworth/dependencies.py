@@ -0,0 +1,248 @@
+#!/usr/bin/python3
+
+"""
+Find which jobs are built from which files.
+
+A DependencyIndex records, for every job, the chunk files it's built from and
+the template it uses (along with the templates.conf defining it).  It can be
+queried in both directions, so the jobs affected by editing a chunk or
+template can be found without generating anything.
+
+Chunk lists are resolved the same way jobs are built, so template chunks a
+job overrides in jobs.conf are attributed to the job's own chunks instead.
+Chunk paths are absolute.
+"""
+
+import os.path
+
+import pennyworth.job_template
+
+
+def get_job_dependencies(job_config, job):
+    """
+    Retrieve what a job is built from.
+
+    Arguments:
+    job_config - A JobConfigs instance.
+    job - The name of the job.
+
+    Returns:
+    A tuple containing 1) a list of the absolute paths of the job's chunks
+    and 2) the name of the job's template (None if it doesn't use one).
+    """
+    chunks = [os.path.abspath(chunk)
+              for chunk in job_config.get_job_chunks(job)]
+    return chunks, job_config.get_job_options(job).get('template')
+
+
+def _add(mapping, key, job):
+    mapping.setdefault(key, set()).add(job)
+
+
+def _remove(mapping, key, job):
+    jobs = mapping[key]
+    jobs.discard(job)
+    if not jobs:
+        del mapping[key]
+
+
+class DependencyIndex:
+    """
+    A two-way mapping between jobs and the files they're built from.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._chunks = {}
+        self._templates = {}
+        self._files = {}
+        self._failures = {}
+
+    def set_job(self, job, chunks, template=None):
+        """
+        Record what a job is built from, replacing anything recorded before.
+
+        Arguments:
+        job - The name of the job.
+        chunks - The chunk files the job is built from.
+        template - The name of the job's template, if it has one.
+        """
+        self.remove_job(job)
+        chunks = set(os.path.abspath(chunk) for chunk in chunks)
+        files = set(chunks)
+        if template:
+            files.add(pennyworth.job_template.get_template_path(template))
+            _add(self._templates, template, job)
+        for path in files:
+            _add(self._files, path, job)
+        for chunk in chunks:
+            _add(self._chunks, chunk, job)
+        self._jobs[job] = (chunks, template, files)
+
+    def set_failure(self, job, failure):
+        """
+        Record that a job's dependencies couldn't be determined.
+
+        Anything previously recorded for the job is kept, so the files it
+        was last known to depend on still lead back to it.
+
+        Arguments:
+        job - The name of the job.
+        failure - The exception raised while resolving the job.
+        """
+        self._failures[job] = failure
+
+    def remove_job(self, job):
+        """
+        Forget a job.
+
+        Arguments:
+        job - The name of the job.
+        """
+        self._failures.pop(job, None)
+        entry = self._jobs.pop(job, None)
+        if entry is None:
+            return
+        chunks, template, files = entry
+        for chunk in chunks:
+            _remove(self._chunks, chunk, job)
+        for path in files:
+            _remove(self._files, path, job)
+        if template:
+            _remove(self._templates, template, job)
+
+    def get_chunk_jobs(self, chunk):
+        """
+        Retrieve the jobs built from a chunk.
+
+        Arguments:
+        chunk - The path of a chunk file.
+
+        Returns:
+        A set of job names.
+        """
+        return set(self._chunks.get(os.path.abspath(chunk), ()))
+
+    def get_template_jobs(self, template):
+        """
+        Retrieve the jobs that use a template.
+
+        Arguments:
+        template - The name of a template (e.g., "folder/name").
+
+        Returns:
+        A set of job names.
+        """
+        return set(self._templates.get(template, ()))
+
+    def get_file_jobs(self, path):
+        """
+        Retrieve the jobs affected by a file.
+
+        Arguments:
+        path - The path of a chunk file or a templates.conf.
+
+        Returns:
+        A set of job names.
+        """
+        return set(self._files.get(os.path.abspath(path), ()))
+
+    def get_job_chunks(self, job):
+        """
+        Retrieve the chunks a job is built from.
+
+        Arguments:
+        job - The name of the job.
+
+        Returns:
+        A set of chunk paths, or None if the job isn't in the index.
+        """
+        entry = self._jobs.get(job)
+        return None if entry is None else set(entry[0])
+
+    def get_job_template(self, job):
+        """
+        Retrieve the template a job uses.
+
+        Arguments:
+        job - The name of the job.
+
+        Returns:
+        The template's name, or None if the job doesn't use one.
+        """
+        entry = self._jobs.get(job)
+        return None if entry is None else entry[1]
+
+    def get_chunks(self):
+        """Retrieve every chunk any job is built from."""
+        return list(self._chunks)
+
+    def get_templates(self):
+        """Retrieve every template any job uses."""
+        return list(self._templates)
+
+    def get_files(self):
+        """Retrieve every file (chunks and templates.conf) jobs depend on."""
+        return list(self._files)
+
+    def get_failures(self):
+        """
+        Retrieve the jobs whose dependencies couldn't be determined.
+
+        Returns:
+        A dictionary mapping job names to the exception raised.
+        """
+        return dict(self._failures)
+
+
+def update_index(index, job_config, job):
+    """
+    Resolve a job's dependencies and record them in an index.
+
+    Arguments:
+    index - A DependencyIndex.
+    job_config - A JobConfigs instance.
+    job - The name of the job.
+
+    Returns:
+    True if the job's dependencies were recorded; False if they couldn't be
+    determined (the failure is recorded in index instead).
+    """
+    try:
+        chunks, template = get_job_dependencies(job_config, job)
+    except Exception as failure:  # pylint: disable=broad-except
+        if index.get_job_chunks(job) is None:
+            # Fixing the job's template is the likeliest way to fix the job,
+            # so depend on it even though the chunks aren't known.
+            try:
+                template = job_config.get_job_options(job).get('template')
+            except Exception:  # pylint: disable=broad-except
+                template = None
+            index.set_job(job, (), template)
+        index.set_failure(job, failure)
+        return False
+    index.set_job(job, chunks, template)
+    return True
+
+
+def build_index(job_config, jobs=None):
+    """
+    Build a DependencyIndex for a job configuration.
+
+    Each templates.conf is only parsed once no matter how many jobs use it,
+    and no chunks are read.
+
+    Arguments:
+    job_config - A JobConfigs instance.
+    jobs - The jobs to include.  If None, every job is included.
+
+    Returns:
+    A DependencyIndex.  Jobs that can't be resolved (e.g., an unknown
+    template) are available from its get_failures method.
+    """
+    index = DependencyIndex()
+    if jobs is None:
+        jobs = job_config.get_jobs()
+    for job in jobs:
+        update_index(index, job_config, job)
+    return index
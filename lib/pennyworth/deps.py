@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+
+"""Code to support the deps command."""
+
+import argparse
+import os.path
+import sys
+
+import pennyworth.command
+import pennyworth.dependencies
+import pennyworth.job_config
+
+
+def _print_jobs(available, jobs):
+    # keep jobs.conf order so output is stable and familiar
+    for job in available:
+        if job in jobs:
+            print(job)
+
+
+def _print_files(index):
+    for path in sorted(index.get_files()):
+        print("{} {}".format(len(index.get_file_jobs(path)), path))
+
+
+def _print_job_files(index, job):
+    template = index.get_job_template(job)
+    if template:
+        print("template {}".format(template))
+    for chunk in sorted(index.get_job_chunks(job) or ()):
+        print("chunk {}".format(chunk))
+
+
+class DepsCommand(pennyworth.command.Command):
+    """
+    A command to show which jobs are built from which files.
+    """
+
+    def __init__(self):
+        super().__init__(prog="pennyworth deps",
+                         description="Show which jobs are built from which "
+                                     "files")
+        self.add_argument("files", nargs="*", default=argparse.SUPPRESS,
+                          help="Chunk files or templates.conf files.  Every "
+                               "job built from any of them is listed.")
+        self.add_argument("--template", dest="templates", action="append",
+                          metavar="TEMPLATE", default=[],
+                          help="List the jobs using TEMPLATE.  Can be given "
+                               "more than once.")
+        self.add_argument("--job", dest="job_names", action="append",
+                          metavar="JOB", default=[],
+                          help="List the template and chunks JOB is built "
+                               "from.  Can be given more than once.")
+
+    def process(self, parsed_args):
+        """
+        Process command-line arguments and execute the command.
+
+        Arguments
+        parsed_args - Parsed command-line arguments
+        """
+        job_config = pennyworth.job_config.make_configs('jobs.conf')
+        for job in parsed_args.job_names:
+            if not job_config.has_job(job):
+                raise Exception("{} is not a valid job".format(job))
+        index = pennyworth.dependencies.build_index(job_config)
+        failures = index.get_failures()
+        for job in sorted(failures):
+            print("Error: {}: {}".format(job, failures[job]), file=sys.stderr)
+
+        files = getattr(parsed_args, 'files', [])
+        if not (files or parsed_args.templates or parsed_args.job_names):
+            _print_files(index)
+        if files or parsed_args.templates:
+            jobs = set()
+            for path in files:
+                if not os.path.exists(path):
+                    raise Exception("{} doesn't exist".format(path))
+                jobs.update(index.get_file_jobs(path))
+            for template in parsed_args.templates:
+                jobs.update(index.get_template_jobs(template))
+            _print_jobs(job_config.get_jobs(), jobs)
+        for job in parsed_args.job_names:
+            if len(parsed_args.job_names) > 1:
+                print("{}:".format(job))
+            _print_job_files(index, job)
+
+
+def main(args=None):
+    # pylint: disable=missing-docstring
+    deps = DepsCommand()
+    pennyworth.command.execute_command(deps, args)
+
+
+_DEPS_COMMAND = (main, "Show which jobs are built from which files")
+
+if __name__ == '__main__':
+    main()
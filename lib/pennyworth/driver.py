@@ -16,12 +16,16 @@ def _do_help():
     print("\t--list\tDisplay available tools")
 
 
-_TOOLS = pennyworth.plugin.query_plugins("pennyworth.commands")
+def _find_tools():
+    # Only the names are needed to dispatch, so nothing is imported until a
+    # tool is actually run.
+    return pennyworth.plugin.find_plugins("pennyworth.commands")
 
 
 def _do_list():
-    for tool in sorted(_TOOLS):
-        print("{} - {}".format(tool, _TOOLS[tool][1]))
+    tools = _find_tools()
+    for tool in sorted(tools):
+        print("{} - {}".format(tool, tools[tool].load()[1]))
 
 
 _EX_TOOLS = {
@@ -33,16 +37,16 @@ _EX_TOOLS = {
 def main():
     # pylint: disable=missing-docstring
     if len(sys.argv) > 1:
-        tool = _TOOLS.get(sys.argv[1])
+        tool = _EX_TOOLS.get(sys.argv[1])
         if tool:
-            tool[0](sys.argv[2:])
+            tool()
+            return
+        tool = _find_tools().get(sys.argv[1])
+        if tool:
+            tool.load()[0](sys.argv[2:])
         else:
-            tool = _EX_TOOLS.get(sys.argv[1])
-            if tool:
-                tool()
-            else:
-                print("{} isn't an available tool".format(sys.argv[1]))
-                sys.exit(1)
+            print("{} isn't an available tool".format(sys.argv[1]))
+            sys.exit(1)
     else:
         _do_help()
 
@@ -0,0 +1,184 @@
+#!/usr/bin/python3
+
+"""
+Run batches of operations against a Jenkins host.
+
+Operations are spread across a pool of worker threads, optionally limited to a
+maximum number of requests per second, and retried with exponential backoff
+when they fail for reasons that are likely to be temporary.
+"""
+
+import concurrent.futures
+import threading
+import time
+
+import pennyworth.timings
+
+
+class RateLimiter:
+    """
+    Limit how often operations start.
+
+    The limiter hands out evenly spaced start times, so a rate of 10 allows
+    one operation to start every tenth of a second regardless of how many
+    threads are asking.
+    """
+
+    def __init__(self, rate=None):
+        self._interval = 1.0 / rate if rate else 0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self):
+        """Block until the caller is allowed to start an operation."""
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self._interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class Operation:
+    """
+    A single planned change.
+
+    Arguments:
+    action - A short description of what the operation does (e.g., "create").
+    name - The name of the job the operation applies to.
+    function - The callable that performs the operation.
+    args - Arguments to pass to function.
+    already_done - An optional function for operations that aren't safe to
+                   repeat.  When a retry fails, it's called with the
+                   exception; if it returns True, an earlier attempt must
+                   have succeeded after all (e.g., a create that timed out
+                   after Jenkins made the job) and the operation counts as a
+                   success.
+    """
+
+    # pylint: disable=too-few-public-methods
+    def __init__(self, action, name, function, *args, already_done=None):
+        self.action = action
+        self.name = name
+        self._function = function
+        self._args = args
+        self._already_done = already_done
+
+    def __call__(self):
+        return self._function(*self._args)
+
+    def was_done(self, failure):
+        """
+        Check if a failed retry means an earlier attempt succeeded.
+
+        Arguments:
+        failure - The exception the retry raised.
+        """
+        return bool(self._already_done and self._already_done(failure))
+
+
+class Result:
+    """
+    The outcome of an Operation.
+
+    Attributes:
+    operation - The Operation that was run.
+    error - The exception raised by the final attempt, or None on success.
+    attempts - How many times the operation was tried.
+    """
+
+    # pylint: disable=too-few-public-methods
+    def __init__(self, operation, error, attempts):
+        self.operation = operation
+        self.error = error
+        self.attempts = attempts
+
+    def succeeded(self):
+        """Check if the operation eventually succeeded."""
+        return self.error is None
+
+
+def _always_retry(failure):
+    # pylint: disable=unused-argument
+    return True
+
+
+def _run_operation(operation, limiter, retries, backoff, retryable):
+    attempt = 0
+    while True:
+        attempt += 1
+        limiter.wait()
+        try:
+            operation()
+            return Result(operation, None, attempt)
+        except Exception as failure:  # pylint: disable=broad-except
+            if attempt > 1 and operation.was_done(failure):
+                return Result(operation, None, attempt)
+            if attempt > retries or not retryable(failure):
+                return Result(operation, failure, attempt)
+        time.sleep(backoff * (2 ** (attempt - 1)))
+
+
+@pennyworth.timings.timed("push")
+def run_operations(operations, workers=1, rate=None, retries=0, backoff=1.0,
+                   retryable=None):
+    """
+    Run a batch of operations.
+
+    Arguments:
+    operations - A list of Operations to run.
+    workers - The maximum number of operations to run at once.
+    rate - The maximum number of operations to start per second.  None means
+           there's no limit.
+    retries - How many times to retry a failed operation.
+    backoff - Seconds to wait before the first retry.  The delay doubles after
+              every failed attempt.
+    retryable - A function that takes an exception and returns True if the
+                failure is worth retrying.  If None, every failure is retried.
+
+    Returns:
+    A list of Results in the same order as operations.
+    """
+    limiter = RateLimiter(rate)
+    if retryable is None:
+        retryable = _always_retry
+
+    def _run(operation):
+        return _run_operation(operation, limiter, retries, backoff, retryable)
+
+    if workers == 1:
+        return [_run(operation) for operation in operations]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_run, operations))
+
+
+def print_summary(results):
+    """
+    Print a summary of a batch of operations.
+
+    Arguments:
+    results - A list of Results, most likely from run_operations.
+
+    Returns:
+    The number of operations that failed.
+    """
+    counts = {}
+    failures = []
+    for result in results:
+        action = result.operation.action
+        counts.setdefault(action, [0, 0])
+        if result.succeeded():
+            counts[action][0] += 1
+        else:
+            counts[action][1] += 1
+            failures.append(result)
+    for action in sorted(counts):
+        print("{}: {} succeeded, {} failed".format(
+            action, counts[action][0], counts[action][1]))
+    for result in failures:
+        print("Failed to {} {} after {} attempt(s): {}".format(
+            result.operation.action, result.operation.name, result.attempts,
+            result.error))
+    return len(failures)
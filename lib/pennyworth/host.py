@@ -4,12 +4,16 @@
 Functionality related to Jenkins host manipulation.
 """
 
+import concurrent.futures
 import os
 import re
-import jenkinsapi.jenkins
+import threading
+import urllib.parse
 
 import pennyworth.config
+import pennyworth.config_cache
 import pennyworth.paths
+import pennyworth.timings
 
 
 def get_hosts():
@@ -24,21 +28,347 @@ def get_hosts():
         os.path.join(pennyworth.paths.get_config_root(), "hosts.conf"))
 
 
+_LIST_PAGE_SIZE = 1000
+
+
+class HostError(Exception):
+    """
+    Raised when Jenkins rejects a request.
+
+    Attributes:
+    response - The requests.Response that Jenkins sent (or, for an AsyncHost,
+               an object with the same url, status_code, text, and
+               request.method attributes).
+    """
+
+    def __init__(self, response):
+        self.response = response
+        super().__init__("{} {} failed with status {}".format(
+            response.request.method, response.url, response.status_code))
+
+
+def _record_response(response, *args, **kwargs):
+    # pylint: disable=unused-argument
+    #
+    # A requests response hook, so every request (including crumbs and
+    # retries) is counted.
+    if pennyworth.timings.enabled():
+        pennyworth.timings.count("http.requests")
+        pennyworth.timings.count("http.bytes_received", len(response.content))
+        body = response.request.body
+        if body:
+            pennyworth.timings.count("http.bytes_sent", len(body))
+
+
+class _Job:
+    # pylint: disable=too-few-public-methods
+    #
+    # The minimal job object handed out by Host.list_jobs.
+    def __init__(self, host, name):
+        self._host = host
+        self.name = name
+
+    def get_config(self):
+        return self._host.get_job_config(self.name)
+
+
 class Host:
-    """A Jenkins host to operate on."""
+    """
+    A Jenkins host to operate on.
+
+    Every request made through a Host shares one HTTP session, so connections
+    are kept alive and reused (up to pool_size of them) and the CSRF crumb is
+    only requested once.
+
+    Arguments:
+    baseurl - The URL to operate on; either the Jenkins root or a folder.
+    username - The user to authenticate as.
+    password - The password (or API token) for username.
+    ssl_verify - If False, don't verify SSL certificates.
+    root_url - The Jenkins root URL, used to request crumbs.  Defaults to
+               baseurl.
+    workers - The maximum number of requests to have in flight at once.
+    rate_limit - The maximum number of changes per second sync should make.
+    retries - How many times sync retries changes that fail transiently.
+    cache - An optional ConfigCache for job configurations.
+    pool_size - The number of connections to keep open.  Defaults to the
+                larger of workers and 10.
+    timeout - Seconds to wait for Jenkins to respond to a request.
+    """
+
+    # pylint: disable=too-many-arguments,too-many-instance-attributes
+    def __init__(self, baseurl, username=None, password=None,
+                 ssl_verify=True, root_url=None, workers=1, rate_limit=None,
+                 retries=0, cache=None, pool_size=None, timeout=10):
+        self._baseurl = baseurl
+        self._root_url = root_url or baseurl
+        self._auth = (username, password) if username else None
+        self._ssl_verify = ssl_verify
+        self._workers = workers
+        self._rate_limit = rate_limit
+        self._retries = retries
+        self._cache = cache
+        self._pool_size = pool_size or max(workers, 10)
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._session = None
+        self._crumb = None
+
+    def _get_session(self):
+        with self._lock:
+            if self._session is None:
+                # requests is slow to import, so wait until a host is
+                # actually used.
+                # pylint: disable=import-outside-toplevel
+                import requests
+                import requests.adapters
+
+                session = requests.Session()
+                session.auth = self._auth
+                session.verify = self._ssl_verify
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=self._pool_size,
+                    pool_maxsize=self._pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.hooks['response'].append(_record_response)
+                self._session = session
+            return self._session
+
+    def _fetch_crumb(self, session):
+        response = session.get(
+            "{}/crumbIssuer/api/json".format(self._root_url),
+            timeout=self._timeout)
+        if response.status_code == 404:
+            # CSRF protection is disabled
+            return {}
+        if response.status_code != 200:
+            raise HostError(response)
+        data = response.json()
+        return {data['crumbRequestField']: data['crumb']}
+
+    def _get_crumb(self, session, stale=None):
+        with self._lock:
+            if self._crumb is None or self._crumb is stale:
+                self._crumb = self._fetch_crumb(session)
+            return self._crumb
+
+    def _get(self, url, **kwargs):
+        response = self._get_session().get(url, timeout=self._timeout,
+                                           **kwargs)
+        if response.status_code != 200:
+            raise HostError(response)
+        return response
+
+    def _post(self, url, valid=(200,), headers=None, **kwargs):
+        session = self._get_session()
+        crumb = self._get_crumb(session)
+        response = session.post(url, headers={**(headers or {}), **crumb},
+                                timeout=self._timeout, **kwargs)
+        if response.status_code == 403 and crumb:
+            # crumbs expire along with the session they were issued to
+            crumb = self._get_crumb(session, crumb)
+            response = session.post(
+                url, headers={**(headers or {}), **crumb},
+                timeout=self._timeout, **kwargs)
+        if response.status_code not in valid:
+            raise HostError(response)
+        return response
+
+    def _post_xml(self, url, xml, **kwargs):
+        return self._post(url, data=xml.encode('utf-8'),
+                          headers={'Content-Type': 'text/xml'}, **kwargs)
+
+    def get_workers(self):
+        """
+        Retrieve the number of concurrent requests allowed against the Host.
+
+        Returns:
+        The maximum number of requests that should be in flight at once.
+        """
+        return self._workers
+
+    def get_rate_limit(self):
+        """
+        Retrieve the maximum rate of changes allowed against the Host.
+
+        Returns:
+        The maximum number of requests per second, or None if there's no
+        limit.
+        """
+        return self._rate_limit
+
+    def get_retries(self):
+        """
+        Retrieve how many times a failed change should be retried.
+
+        Returns:
+        The number of retries for changes that fail for transient reasons.
+        """
+        return self._retries
+
+    def get_cache(self):
+        """
+        Retrieve the cache of job configurations for the Host.
+
+        Returns:
+        A ConfigCache, or None if configurations aren't cached.
+        """
+        return self._cache
+
+    def _discard_cached(self, name):
+        if self._cache:
+            self._cache.discard(name)
 
-    def __init__(self, *args, **kwargs):
-        self._host = jenkinsapi.jenkins.Jenkins(*args, **kwargs)
+    def _job_url(self, name):
+        if not name:
+            return self._baseurl
+        return self._baseurl + _job_path(name)
 
     def list_jobs(self):
         """
         Retrieve jobs configured on the Host.
 
-        Returns a list of tuples containing 1) the job name and 2) a
-        jenkinsapi.job.Job instance
+        Returns a list of tuples containing 1) the job name and 2) an object
+        whose get_config method retrieves the job's configuration.  Prefer
+        list_job_names and get_job_config.
         """
-        return self._host.get_jobs()
+        return [(name, _Job(self, name)) for name in self.list_job_names()]
+
+    def _list_request(self, folder, page):
+        # The URL and parameters to request a page of the items inside folder
+        # (a path relative to the Host, or '' for the Host itself).
+        start = page * _LIST_PAGE_SIZE
+        return "{}/api/json".format(self._job_url(folder)), {
+            'tree': "jobs[name,_class]{{{},{}}}".format(
+                start, start + _LIST_PAGE_SIZE)}
+
+    @staticmethod
+    def _read_list_page(data, items, seen):
+        # Adds (name, is_folder) for every new item in a page of a listing to
+        # items.  Returns True if there might be more pages.
+        page = data.get('jobs', [])
+        new_items = [(job['name'], _is_folder(job)) for job in page
+                     if job['name'] not in seen]
+        items.extend(new_items)
+        seen.update(name for name, _ in new_items)
+        # Servers that don't support ranges return everything at once, so
+        # stop as soon as a page doesn't add anything.
+        return len(page) >= _LIST_PAGE_SIZE and bool(new_items)
+
+    def _list_items(self, folder):
+        # Returns (name, is_folder) for everything directly inside folder.
+        items = []
+        seen = set()
+        page = 0
+        while True:
+            url, params = self._list_request(folder, page)
+            if not self._read_list_page(self._get(url, params=params).json(),
+                                        items, seen):
+                return items
+            page += 1
+
+    def _crawl(self):
+        names = []
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self._workers) as pool:
+            pending = {pool.submit(self._list_items, ''): ''}
+            while pending:
+                done, _ = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    prefix = pending.pop(future)
+                    for name, folder in future.result():
+                        if folder:
+                            path = prefix + name
+                            pending[pool.submit(self._list_items, path)] = \
+                                path + '/'
+                        else:
+                            names.append(prefix + name)
+        return names
+
+    @pennyworth.timings.timed("list jobs")
+    def list_job_names(self, recursive=False):
+        """
+        Retrieve the names of jobs configured on the Host.
+
+        Unlike list_jobs, this doesn't create an object (or make a request)
+        per job.  Names are requested in pages of _LIST_PAGE_SIZE, so even
+        very large folders only take a few requests.
 
+        Arguments:
+        recursive - If True, descend into folders (crawling up to
+                    get_workers() folders at once) and return the jobs inside
+                    them named by their path (e.g., "team/app/build").
+                    Folders themselves aren't included.
+
+        Returns a list of job names.
+        """
+        if recursive:
+            return self._crawl()
+        return [name for name, _ in self._list_items('')]
+
+    @pennyworth.timings.timed("fetch job")
+    def get_job_config(self, name):
+        """
+        Retrieve a job's configuration.
+
+        Arguments:
+        name - The name of the job.  Jobs in nested folders are named by their
+               path relative to the Host.
+
+        Returns the job's configuration as an XML string.
+        """
+        return self._get("{}/config.xml".format(self._job_url(name))).text
+
+    def get_job_configs(self, names, missing_ok=False):
+        """
+        Retrieve several jobs' configurations.
+
+        Configurations are retrieved using up to get_workers() concurrent
+        requests.  A failure retrieving one job doesn't stop the others.
+
+        Arguments:
+        names - The names of the jobs.
+        missing_ok - If True, jobs that don't exist are left out of the
+                     result instead of being reported as failures.
+
+        Returns:
+        A tuple containing 1) a dictionary mapping job names to their
+        configurations, and 2) a dictionary mapping the names of jobs that
+        couldn't be retrieved to the exception raised.
+        """
+        # pylint: disable=broad-except
+        job_configs = {}
+        failures = {}
+        get_config = self.get_job_config
+        if missing_ok:
+            def get_config(name):
+                return _get_existing_config(self, name)
+
+        if self._workers == 1:
+            for name in names:
+                try:
+                    job_configs[name] = get_config(name)
+                except Exception as failure:
+                    failures[name] = failure
+        else:
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self._workers) as pool:
+                futures = {name: pool.submit(get_config, name)
+                           for name in names}
+                for name, future in futures.items():
+                    try:
+                        job_configs[name] = future.result()
+                    except Exception as failure:
+                        failures[name] = failure
+        missing = [name for name, config in job_configs.items()
+                   if config is None]
+        for name in missing:
+            del job_configs[name]
+        return job_configs, failures
+
+    @pennyworth.timings.timed("update job")
     def change_job(self, name, xml):
         """
         Change a job's configuration on a host.
@@ -47,19 +377,25 @@ class Host:
         name - The name of the job.
         xml - The xml configuration that should be applied.
         """
-        job = self._host.get_job(name)
-        return job.update_config(xml)
+        self._discard_cached(name)
+        self._post_xml("{}/config.xml".format(self._job_url(name)), xml)
 
+    @pennyworth.timings.timed("create job")
     def create_job(self, name, xml):
         """
         Create a new job on the host.
 
         Arguments:
-        name - The name of the new job.
+        name - The name of the new job.  If it's a path, the folders leading
+               up to the job must already exist.
         xml - The configuration of the new job.
         """
-        return self._host.create_job(name, xml)
+        self._discard_cached(name)
+        folder, _, leaf = name.rpartition('/')
+        self._post_xml("{}/createItem".format(self._job_url(folder)), xml,
+                       params={'name': leaf})
 
+    @pennyworth.timings.timed("erase job")
     def erase_job(self, name):
         """
         Remove a job from the host.
@@ -67,16 +403,60 @@ class Host:
         Arguments:
         name - The name of the job to remove.
         """
-        return self._host.delete_job(name)
+        self._discard_cached(name)
+        # Jenkins redirects to the parent after deleting; there's no need to
+        # follow it.
+        self._post("{}/doDelete".format(self._job_url(name)),
+                   valid=(200, 302), allow_redirects=False)
+
+
+def _job_path(name):
+    return "".join("/job/{}".format(urllib.parse.quote(part, safe=''))
+                   for part in name.split('/'))
+
+
+def _is_folder(job):
+    # Folders (and organization folders) hold other jobs; multibranch
+    # projects are treated as jobs since pennyworth manages their
+    # configuration rather than the branch jobs they generate.
+    return job.get('_class', '').endswith('Folder')
+
+
+_TRANSIENT_STATUS_CODES = frozenset([408, 429, 500, 502, 503, 504])
+
+
+def is_transient_failure(failure):
+    """
+    Check if a failed request is worth retrying.
+
+    Arguments:
+    failure - The exception raised by a Host method.
+
+    Returns:
+    True if the failure looks temporary (connection problems, timeouts, or
+    server errors), False otherwise.
+    """
+    if isinstance(failure, HostError):
+        return failure.response.status_code in _TRANSIENT_STATUS_CODES
+    if isinstance(failure, (ConnectionError, TimeoutError)):
+        # AsyncHost reports connection problems and timeouts as the built-in
+        # exceptions
+        return True
+    # Anything else raised by a Host method means requests is already
+    # imported.
+    # pylint: disable=import-outside-toplevel
+    import requests
+
+    return isinstance(failure, (requests.ConnectionError, requests.Timeout))
 
 
 _DUPLICATE_END_SLASH_REGEX = re.compile(R"\/\/+$")
 
 
 def _strip_trailing_slashes(uri):
-    # If the uri has trailing slashes, something in the jenkinsapi library gets
-    # confused.  This makes sure there aren't any slashes at the end of the
-    # Jenkins URI.
+    # If the uri has trailing slashes, job URLs built from it end up with
+    # doubled slashes.  This makes sure there aren't any slashes at the end of
+    # the Jenkins URI.
     uri = _DUPLICATE_END_SLASH_REGEX.sub('/', uri)
     if uri[-1] == '/':
         return uri[:-1]
@@ -97,13 +477,14 @@ def _strip_bad_folder_slashes(folder):
     return folder[first:]
 
 
-def make_host(host_config, folder=None):
+def make_host(host_config, folder=None, refresh=False):
     """
     Make a Host object based on a configuration an optional folder.
 
     Arguments
     host_config - A host configuration from a hosts.conf.
     folder - A folder in the Jenkins instance to operate in.
+    refresh - If True, ignore any cached job configurations.
     """
     kwargs = {
         'baseurl': _strip_trailing_slashes(host_config.get('uri')),
@@ -112,24 +493,100 @@ def make_host(host_config, folder=None):
     }
     if host_config.get('verify_ssl', True) == 'false':
         kwargs['ssl_verify'] = False
+    workers = host_config.getint('workers', fallback=1)
+    if workers < 1:
+        raise Exception("{} is not a valid number of workers".format(workers))
+    kwargs['workers'] = workers
+    rate_limit = host_config.getfloat('rate_limit', fallback=None)
+    if rate_limit is not None and rate_limit <= 0:
+        raise Exception("{} is not a valid rate limit".format(rate_limit))
+    kwargs['rate_limit'] = rate_limit
+    retries = host_config.getint('retries', fallback=0)
+    if retries < 0:
+        raise Exception("{} is not a valid number of retries".format(retries))
+    kwargs['retries'] = retries
+    kwargs['pool_size'] = host_config.getint('pool_size', fallback=None)
+    kwargs['timeout'] = host_config.getfloat('timeout', fallback=10)
+    kwargs['root_url'] = kwargs['baseurl']
+    folders = []
     if folder:
         folders = _strip_bad_folder_slashes(folder).split('/')
         kwargs['baseurl'] += "/{}{}".format("job/", "/job/".join(folders))
+    max_age = host_config.getfloat('cache_max_age', fallback=None)
+    if max_age:
+        kwargs['cache'] = pennyworth.config_cache.make_cache(
+            host_config.name, folders, max_age, refresh)
+    backend = host_config.get('backend', 'requests')
+    if backend == 'async':
+        # pylint: disable=import-outside-toplevel
+        from pennyworth import async_host
+
+        return async_host.AsyncHost(**kwargs)
+    if backend != 'requests':
+        raise Exception("{} is not a valid backend".format(backend))
     return Host(**kwargs)
 
 
-def get_host_configs(host):
+def _get_existing_config(host, name):
+    try:
+        return host.get_job_config(name)
+    except HostError as failure:
+        if failure.response.status_code == 404:
+            return None
+        raise
+
+
+@pennyworth.timings.timed("fetch")
+def get_host_configs(host, recursive=False, jobs=None, use_cache=True):
     """
     Retrieve all jobs and their configurations from a host.
 
     Arguments:
     host - The Host to operate on.
+    recursive - If True, include jobs in nested folders, named by their path
+                relative to host (see Host.list_job_names).
+    jobs - If provided, only retrieve these jobs instead of every job on the
+           host.  The host's jobs aren't listed; jobs that don't exist are
+           left out of the result.
+    use_cache - If False, cached configurations are ignored and everything is
+                fetched from the host (the cache is still updated with what
+                was fetched).
+
+    Configurations are retrieved using up to host.get_workers() concurrent
+    requests.  A failure retrieving one job doesn't stop the others; once
+    every request has finished, all failures are reported together.  If the
+    host has a ConfigCache, fresh cached configurations are used instead of
+    fetching them, and jobs that no longer exist are evicted from it.
 
     Returns:
     A dictionary of job configurations.  Each key will be a job name and the
     value will be the job's configuration as an XML string.
     """
+    selected = jobs is not None
+    names = jobs if selected else host.list_job_names(recursive)
+    cache = host.get_cache()
     job_configs = {}
-    for name, job in host.list_jobs():
-        job_configs[name] = job.get_config()
+    if cache:
+        missing = []
+        for name in names:
+            config = cache.get(name) if use_cache else None
+            if config is None:
+                missing.append(name)
+            else:
+                job_configs[name] = config
+        pennyworth.timings.count("config_cache.hits", len(job_configs))
+        pennyworth.timings.count("config_cache.misses", len(missing))
+        fetched, failures = host.get_job_configs(missing, selected)
+        for name, config in fetched.items():
+            cache.set(name, config)
+        if not selected:
+            cache.evict(set(names))
+        cache.save()
+    else:
+        fetched, failures = host.get_job_configs(names, selected)
+    job_configs.update(fetched)
+    if failures:
+        raise Exception("Failed to retrieve configurations for {}".format(
+            ", ".join("{} ({})".format(name, failures[name])
+                      for name in sorted(failures))))
     return job_configs
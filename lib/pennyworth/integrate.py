@@ -8,7 +8,150 @@ Jenkins host compared to generated configurations, but the code here should
 remain generic.
 """
 
-import copy
+import hashlib
+
+
+def _digest(config):
+    return hashlib.sha256(config.encode('utf-8')).hexdigest()
+
+
+def _size(config):
+    return len(config.encode('utf-8'))
+
+
+class Plan:
+    """
+    The differences between two sources of jobs.
+
+    Jobs are sorted into four lists, each in the order jobs appear in the
+    sources (jobs from first, then jobs that are only in second):
+      - unchanged: jobs with equivalent configurations in both sources
+      - changed: jobs in both sources whose configurations differ
+      - added: jobs that are only in second
+      - removed: jobs that are only in first
+
+    Neither source is copied, so they shouldn't be modified while the Plan is
+    in use.
+
+    Arguments:
+    first - The first source of job configurations.
+    second - The second source of job configurations.
+    key - A function that takes a configuration and returns what should be
+          compared (e.g., a normalized version).  If None, configurations must
+          be identical to be unchanged.
+    """
+
+    def __init__(self, first, second, key=None):
+        self.first = first
+        self.second = second
+        self.unchanged = []
+        self.changed = []
+        self.added = []
+        self.removed = []
+        self._key = key
+        self._digests = ({}, {})
+        # changed and removed jobs in the order they were found, so
+        # differences() can report them like compare always has
+        self._different = []
+
+        for name, config in first.items():
+            if name not in second:
+                self.removed.append(name)
+                self._different.append(name)
+            elif self._same(name, config, second[name]):
+                self.unchanged.append(name)
+            else:
+                self.changed.append(name)
+                self._different.append(name)
+        for name in second:
+            if name not in first:
+                self.added.append(name)
+                self._different.append(name)
+
+    def _same(self, name, first_config, second_config):
+        # identical strings are the common case and don't need a key or digest
+        if first_config == second_config:
+            return True
+        if self._key is None:
+            return False
+        first_digest, second_digest = self.get_digests(name)
+        return first_digest == second_digest
+
+    def get_digests(self, name):
+        """
+        Get the content digests for a job.
+
+        Digests are computed from a job's key (or configuration, if there's no
+        key function) the first time they're needed and remembered afterwards.
+
+        Arguments:
+        name - The name of a job.
+
+        Returns:
+        A tuple containing the digests of the job in first and second.  A
+        digest is None if the job isn't in that source.
+        """
+        digests = []
+        for source, cache in zip((self.first, self.second), self._digests):
+            if name not in source:
+                digests.append(None)
+                continue
+            if name not in cache:
+                config = source[name]
+                if self._key is not None:
+                    config = self._key(config)
+                cache[name] = _digest(config)
+            digests.append(cache[name])
+        return tuple(digests)
+
+    def differences(self):
+        """
+        Iterate over jobs that differ between the sources.
+
+        Returns:
+        An iterator of tuples containing 1) the name of the job, 2) the
+        configuration in first (None if it doesn't exist), and 3) the
+        configuration in second (None if it doesn't exist).
+        """
+        for name in self._different:
+            yield name, self.first.get(name), self.second.get(name)
+
+    def get_counts(self):
+        """
+        Get the number of jobs of each kind.
+
+        Returns:
+        A dictionary with "unchanged", "changed", "added", and "removed" keys.
+        """
+        return {
+            "unchanged": len(self.unchanged),
+            "changed": len(self.changed),
+            "added": len(self.added),
+            "removed": len(self.removed),
+        }
+
+    def get_sizes(self):
+        """
+        Get the size of the jobs of each kind.
+
+        Removed jobs are measured in first; everything else is measured in
+        second, since that's the configuration a sync would leave behind.
+
+        Returns:
+        A dictionary with the same keys as get_counts, containing sizes in
+        bytes of UTF-8 encoded configurations.
+        """
+        return {
+            "unchanged": sum(_size(self.second[name])
+                             for name in self.unchanged),
+            "changed": sum(_size(self.second[name]) for name in self.changed),
+            "added": sum(_size(self.second[name]) for name in self.added),
+            "removed": sum(_size(self.first[name]) for name in self.removed),
+        }
+
+    def __len__(self):
+        return (len(self.unchanged) + len(self.changed) + len(self.added) +
+                len(self.removed))
 
 
 def compare(first, second, handler):
@@ -31,15 +174,6 @@ def compare(first, second, handler):
                 3) the configuration in the second set (None if it doesn't
                    exist)
     """
-    first = copy.copy(first)
-    second = copy.copy(second)
-    for name, config in first.items():
-        second_config = None
-        if name in second:
-            second_config = second[name]
-            del second[name]
-        handler(name, config, second_config)
-
-    first_config = None
-    for name, config in second.items():
-        handler(name, first_config, config)
+    for name, first_config, second_config in Plan(first,
+                                                  second).differences():
+        handler(name, first_config, second_config)
@@ -2,11 +2,16 @@
 
 """Types and functions to support job configuration."""
 
+import collections
+import concurrent.futures
 import os.path
 import re
 
+import pennyworth.build_store
 import pennyworth.config
+import pennyworth.job_index
 import pennyworth.job_template
+import pennyworth.timings
 
 
 class ChunkCache:
@@ -16,39 +21,159 @@ class ChunkCache:
     Since pennyworth stitches together different files to form complete
     configurations, it's likely that many jobs will share many of the same
     chunks (e.g., the beginning and end of job configuration).  This class
-    keeps a cache of file contents to avoid opening and closing the same file
-    multiple times.
+    keeps a cache of compiled chunks to avoid opening, closing, and scanning
+    the same file multiple times.
+
+    By default the cache grows without limit and assumes files don't change,
+    which suits generating jobs once.  Long-running processes can limit the
+    cache's size and have it notice modified files.
+
+    Arguments:
+    max_bytes - If provided, the least recently used chunks are evicted to
+                keep the total size of cached chunks at or below max_bytes.
+    revalidate - If True, a cached chunk is discarded when its file's
+                 modification time or size changes.
     """
 
-    def __init__(self):
-        self._cache = {}
+    def __init__(self, max_bytes=None, revalidate=False):
+        self._cache = collections.OrderedDict()
+        self._max_bytes = max_bytes
+        self._revalidate = revalidate
+        self._bytes = 0
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'invalidations': 0
+        }
+
+    def _remove(self, key):
+        _, size, _ = self._cache.pop(key)
+        self._bytes -= size
 
     def get(self, key, fallback=None):
         """
-        Get file contents from the cache.
+        Get a compiled chunk from the cache.
 
         Arguments:
         key - The filename to look up.
         fallback - The return value if key isn't cached.
 
         Return:
-        If key is cached, then the contents of its file.  If it's not in the
-        cache, then fallback.
+        If key is cached, then its compiled chunk.  If it's not in the cache,
+        then fallback.
+        """
+        entry = self._cache.get(key)
+        if entry is not None and self._revalidate and \
+                entry[2] != pennyworth.config.file_signature(key):
+            self._remove(key)
+            self._stats['invalidations'] += 1
+            entry = None
+        if entry is None:
+            self._stats['misses'] += 1
+            pennyworth.timings.count("chunk_cache.misses")
+            return fallback
+        self._cache.move_to_end(key)
+        self._stats['hits'] += 1
+        pennyworth.timings.count("chunk_cache.hits")
+        return entry[0]
+
+    def get_signature(self, key):
+        """
+        Retrieve the signature set should store with a chunk.
+
+        Take the signature before reading the file, so a change made while
+        it's being read is noticed by the next call to get.
+
+        Arguments:
+        key - The filename that's about to be read.
+
+        Return:
+        The file's signature, or None if the cache doesn't revalidate chunks.
         """
-        return self._cache.get(key, fallback)
+        if not self._revalidate:
+            return None
+        return pennyworth.config.file_signature(key)
 
-    def set(self, key, value):
+    def set(self, key, value, signature=None):
         """
         Set cache contents.
 
         Arguments:
         key - The filename being cached.
-        value - The conents of key.
+        value - The compiled contents of key.
+        signature - The signature from get_signature, taken before key was
+                    read.  If None, the file's current signature is used.
+        """
+        if key in self._cache:
+            self._remove(key)
+        size = len(value)
+        if self._max_bytes is not None and size > self._max_bytes:
+            return
+        if signature is None:
+            signature = self.get_signature(key)
+        self._cache[key] = (value, size, signature)
+        self._bytes += size
+        while self._max_bytes is not None and self._bytes > self._max_bytes:
+            self._remove(next(iter(self._cache)))
+            self._stats['evictions'] += 1
+
+    def get_stats(self):
         """
-        self._cache[key] = value
+        Retrieve cache statistics.
 
+        Return:
+        A dictionary containing hit, miss, eviction, and invalidation counts
+        along with the number of cached chunks and their total size.
+        """
+        stats = dict(self._stats)
+        stats['entries'] = len(self._cache)
+        stats['bytes'] = self._bytes
+        return stats
+
+
+_TOKEN_PATTERN = re.compile(R"@@([^@\s]+)@@")
+
+
+class _CompiledChunk:
+    # pylint: disable=too-few-public-methods
+    #
+    # A chunk split on the token pattern: literal text is at even indices of
+    # parts and token names are at odd indices.  Scanning for tokens happens
+    # once per chunk, so building a job only has to fill in the slots.
+    __slots__ = ('parts', 'size')
 
-_OPTION_PATTERN = re.compile(R"^sub\.")
+    def __init__(self, data):
+        self.parts = _TOKEN_PATTERN.split(data)
+        self.size = len(data)
+
+    def __len__(self):
+        return self.size
+
+
+class UnresolvedSubstitutionError(Exception):
+    """
+    Raised when a strict build leaves substitution tokens in a configuration.
+
+    Attributes:
+    tokens - The names of the unresolved tokens.
+    job - The job being built, if known.
+    """
+
+    def __init__(self, tokens, job=None):
+        self.tokens = tokens
+        self.job = job
+        names = ", ".join("@@{}@@".format(token) for token in tokens)
+        if job:
+            message = "{} has unresolved substitutions: {}".format(job, names)
+        else:
+            message = "Unresolved substitutions: {}".format(names)
+        super().__init__(message)
+
+    def __reduce__(self):
+        # Rebuild from the original arguments so the error survives being
+        # sent back from a worker process.
+        return (type(self), (self.tokens, self.job))
 
 
 def _make_chunk_iterator(job_config):
@@ -117,14 +242,37 @@ _BUILD_METHODS = {
 
 
 class JobConfigs:
-    """A class to work with job configuration"""
+    """
+    A class to work with job configuration
 
-    def __init__(self, config):
-        self._config = config
+    Arguments:
+    index - A compiled job configuration, most likely from
+            pennyworth.job_index.load_index.
+    """
+
+    def __init__(self, index):
+        self._jobs = index['jobs']
+
+    def _get_job(self, job_name):
+        job = self._jobs.get(job_name)
+        if job is None:
+            raise Exception("{} isn't a known job".format(job_name))
+        if 'error' in job:
+            raise Exception(job['error'])
+        return job
 
     def get_jobs(self):
         """Retrieve a lsit of available jobs."""
-        return self._config.sections()
+        return list(self._jobs)
+
+    def has_job(self, job_name):
+        """
+        Check if a job is configured.
+
+        Arguments:
+        job_name - The name of the job.
+        """
+        return job_name in self._jobs
 
     def get_job_chunks(self, job_name):
         """
@@ -133,13 +281,11 @@ class JobConfigs:
         Arguments:
         job_name - The name of the job to generate.
         """
-        enabled_methods = []
-        for option in self._config.options(job_name):
-            if option in _BUILD_METHODS:
-                enabled_methods.append(option)
+        job = self._get_job(job_name)
+        enabled_methods = job['methods']
 
         if len(enabled_methods) == 1:
-            return _BUILD_METHODS[enabled_methods[0]](self._config[job_name])
+            return _BUILD_METHODS[enabled_methods[0]](job['options'])
         elif not enabled_methods:
             raise Exception(
                 "{} doesn't specify a build method".format(job_name))
@@ -147,91 +293,296 @@ class JobConfigs:
             "{} specifies multiple build methods ({})".format(
                 job_name, enabled_methods))
 
+    def get_job_options(self, job_name):
+        """
+        Retrieve every option set for a job.
+
+        Arguments:
+        job_name - The job to retrieve options for.
+
+        Return:
+        A dictionary of option names and their (interpolated) values.
+        """
+        return dict(self._get_job(job_name)['options'])
+
     def get_job_subs(self, job_name):
         """
-        Retrieve a list of string substitions for a job.
+        Retrieve the string substitions for a job.
 
         Arguments:
         job_name - The job to generate substitions for.
 
         Return:
-        A list of tuples, where the first element is a compiled-regular
-        expression and the second element is the value to substite.
+        A dictionary mapping token names to the value to substitute.  A key of
+        NAME replaces @@NAME@@ in the job's configuration.
         """
-        subs = []
-        for option, value in self._config[job_name].items():
-            match = _OPTION_PATTERN.match(option)
-            if match:
-                sub = re.compile("@@{}@@".format(option[match.end():].upper()))
-                subs.append((sub, value))
-        return subs
+        return self._get_job(job_name)['subs']
 
 
+@pennyworth.timings.timed("load jobs.conf")
 def make_configs(config_path):
     """
     Create a JobConfigs instance based on a configuration file.
 
+    The file's compiled index is cached, so parsing and interpolation only
+    happen when the file changes.
+
     Arguments:
     config_path - Filesystem path to a job configuration file.
 
     Returns:
     A JobConfigs instance based on config_path.
     """
-    job_configs = pennyworth.config.read_config(config_path)
-    return JobConfigs(job_configs)
+    return JobConfigs(pennyworth.job_index.load_index(config_path))
 
 
+@pennyworth.timings.timed("read chunks")
 def _build_config(chunks, cache):
-    config = ""
+    compiled_chunks = []
     for chunk in chunks:
         chunk_data = cache.get(chunk)
-        if not chunk_data:
+        if chunk_data is None:
+            signature = cache.get_signature(chunk)
             with open(chunk) as chunk_file:
-                chunk_data = chunk_file.read()
-            cache.set(chunk, chunk_data)
-        config += chunk_data
-    return config
+                chunk_data = _CompiledChunk(chunk_file.read())
+            cache.set(chunk, chunk_data, signature)
+        compiled_chunks.append(chunk_data)
+    return compiled_chunks
+
+
+@pennyworth.timings.timed("substitute")
+def _sub_config(compiled_chunks, subs):
+    output = []
+    unresolved = []
+    for chunk in compiled_chunks:
+        parts = chunk.parts
+        output.append(parts[0])
+        for index in range(1, len(parts), 2):
+            value = subs.get(parts[index])
+            if value is None:
+                unresolved.append(parts[index])
+                value = "@@{}@@".format(parts[index])
+            output.append(value)
+            output.append(parts[index + 1])
+    return ''.join(output), unresolved
+
+
+def build_config(chunks, cache, subs, strict=False):
+    """
+    Build a job configuration.
 
+    Arguments:
+    chunks - An iterator to configuration chunks.  This should probably be
+             something returned from JobConfigs.get_job_chunks.
+    cache - A ChunkCache object.
+    subs - Substitutions to use.  This should be something returned from
+           JobConfigs.get_job_subs.
+    strict - If True, raise an UnresolvedSubstitutionError if any @@NAME@@
+             tokens don't have a substitution.  Otherwise they're left in
+             the configuration.
 
-def _sub_config(config, subs):
-    for compiled_re, value in subs:
-        config = compiled_re.sub(value, config)
+    Returns:
+    An XML string of the generated job.
+    """
+    config, unresolved = _sub_config(_build_config(chunks, cache), subs)
+    if strict and unresolved:
+        raise UnresolvedSubstitutionError(unresolved)
     return config
 
 
-def build_config(chunks, cache, subs):
+def _build_job(job_config, job, cache):
+    return _sub_config(
+        _build_config(job_config.get_job_chunks(job), cache),
+        job_config.get_job_subs(job))
+
+
+def _lookup_job(job_config, job, store):
+    chunks = list(job_config.get_job_chunks(job))
+    digest = store.job_digest(job_config.get_job_options(job), chunks)
+    stored = store.get(job, digest)
+    pennyworth.timings.count("build_store.misses" if stored is None
+                             else "build_store.hits")
+    return digest, stored
+
+
+def _check_unresolved(job, unresolved, strict):
+    if strict and unresolved:
+        raise UnresolvedSubstitutionError(unresolved, job)
+
+
+def generate_config(job_config, job, cache, store=None, strict=False):
     """
-    Build a job configuration.
+    Generate a single job's configuration.
 
     Arguments:
-    chunks - An iterator to configuration chunks.  This should probably be
-             something returned from JobConfigs.get_job_chunks.
+    job_config - A JobConfigs instance.
+    job - The name of the job to generate.
     cache - A ChunkCache object.
-    subs - Substitution patterns to use.  This should be something returned
-           from JobConfigs.get_job_subs.
+    store - An optional BuildStore.  If the job's inputs haven't changed since
+            it was last stored, the stored configuration is reused.
+    strict - If True, raise an UnresolvedSubstitutionError if the job is left
+             with any unresolved @@NAME@@ tokens.
 
     Returns:
     An XML string of the generated job.
     """
-    config = _build_config(chunks, cache)
-    return _sub_config(config, subs)
+    if store is None:
+        config, unresolved = _build_job(job_config, job, cache)
+    else:
+        digest, stored = _lookup_job(job_config, job, store)
+        if stored is None:
+            config, unresolved = _build_job(job_config, job, cache)
+            store.set(job, digest, config, unresolved)
+        else:
+            config, unresolved = stored
+    _check_unresolved(job, unresolved, strict)
+    return config
+
+
+# State for worker processes used by generate_job_configs.  Each worker gets
+# its own copy of the job configuration and its own chunk cache.
+_WORKER_STATE = {}
+
+
+def _init_worker(job_config):
+    _WORKER_STATE['job_config'] = job_config
+    _WORKER_STATE['cache'] = ChunkCache()
 
 
-def generate_configs():
+def _build_in_worker(job):
+    return _build_job(_WORKER_STATE['job_config'], job,
+                      _WORKER_STATE['cache'])
+
+
+def _build_batch_in_worker(jobs):
+    return [_build_in_worker(job) for job in jobs]
+
+
+# Jobs are sent to worker processes in batches to keep the overhead of
+# passing them around low, and only a few batches per process are in flight
+# at once so memory use doesn't grow with the number of jobs.
+_BATCH_SIZE = 32
+_BATCHES_PER_PROCESS = 4
+
+
+def _iter_batches(job_config, jobs, store):
+    # Yields lists of (job, digest, stored) tuples.  Jobs are looked up in
+    # the store as their batch is made, not all up front.
+    batch = []
+    for job in jobs:
+        digest = stored = None
+        if store:
+            digest, stored = _lookup_job(job_config, job, store)
+        batch.append((job, digest, stored))
+        if len(batch) == _BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@pennyworth.timings.timed("generate")
+def iter_job_configs(job_config, jobs, store=None, strict=False,
+                     processes=1):
+    """
+    Generate configurations for several jobs, yielding each as it's ready.
+
+    Only the configurations that haven't been consumed yet are kept in memory
+    (with several processes, that's at most a few batches of jobs per
+    process), so this is suitable for very large numbers of jobs.
+
+    Arguments:
+    job_config - A JobConfigs instance.
+    jobs - The names of the jobs to generate.
+    store - An optional BuildStore.  Jobs whose inputs haven't changed since
+            they were last stored are reused instead of generated.
+    strict - If True, raise an UnresolvedSubstitutionError if any job is left
+             with unresolved @@NAME@@ tokens.
+    processes - The number of processes to generate jobs with.  Jobs are
+                spread across a process pool when this is greater than one;
+                the results are identical to generating them serially.
+
+    Yields:
+    Tuples of a job name and its XML configuration, in the same order as
+    jobs.
+    """
+    if processes == 1:
+        cache = ChunkCache()
+        for job in jobs:
+            yield job, generate_config(job_config, job, cache, store, strict)
+        return
+
+    batches = _iter_batches(job_config, jobs, store)
+    window = collections.deque()
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=processes, initializer=_init_worker,
+            initargs=(job_config,)) as pool:
+
+        def _submit_next():
+            batch = next(batches, None)
+            if batch is not None:
+                pending = [job for job, _, stored in batch if stored is None]
+                window.append((batch, pool.submit(_build_batch_in_worker,
+                                                  pending)))
+
+        for _ in range(processes * _BATCHES_PER_PROCESS):
+            _submit_next()
+        while window:
+            batch, future = window.popleft()
+            built = iter(future.result())
+            _submit_next()
+            for job, digest, stored in batch:
+                if stored is None:
+                    stored = next(built)
+                    if store:
+                        store.set(job, digest, *stored)
+                config, unresolved = stored
+                _check_unresolved(job, unresolved, strict)
+                yield job, config
+
+
+def generate_job_configs(job_config, jobs, store=None, strict=False,
+                         processes=1):
+    """
+    Generate configurations for several jobs.
+
+    Arguments are the same as iter_job_configs.
+
+    Returns:
+    A dictionary of job configurations in the same order as jobs.  The keys
+    will be job names, and the values will be XML configurations.
+    """
+    return dict(iter_job_configs(job_config, jobs, store, strict, processes))
+
+
+def generate_configs(incremental=False, strict=False, processes=1,
+                     selector=None):
     """
     Create all configurations specified in a jobs.conf file.
 
+    Arguments:
+    incremental - If True, reuse configurations generated by previous runs
+                  for jobs whose inputs haven't changed.
+    strict - If True, fail if any job is left with unresolved @@NAME@@
+             tokens.
+    processes - The number of processes to generate jobs with.
+    selector - An optional function that takes a JobConfigs instance and
+               returns the names of the jobs to generate.  If None, every job
+               is generated.
+
     Returns:
     A dictionary of job configurations.  The keys will be job names, and the
     values of each key will be XML configurations.
     """
     job_config = make_configs('jobs.conf')
     available_jobs = job_config.get_jobs()
-    chunk_cache = ChunkCache()
-    jobs = {}
-    for job in available_jobs:
-        config = build_config(
-            job_config.get_job_chunks(job), chunk_cache,
-            job_config.get_job_subs(job))
-        jobs[job] = config
+    jobs = available_jobs
+    if selector:
+        jobs = selector(job_config)
+    store = None
+    if incremental:
+        store = pennyworth.build_store.make_store('jobs.conf')
+    jobs = generate_job_configs(job_config, jobs, store, strict, processes)
+    if store:
+        store.save(available_jobs)
     return jobs
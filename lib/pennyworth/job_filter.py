@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+
+"""
+Select a subset of the jobs in a job configuration.
+
+Jobs can be selected by name, by a glob (e.g., "team-*"), by a regular
+expression prefixed with "re:" (e.g., "re:^team-(a|b)$"), by the template they
+use, or by a chunk they're built from.  A job is selected if it matches any of
+the filters.
+"""
+
+import fnmatch
+import re
+
+import pennyworth.dependencies
+
+_GLOB_CHARACTERS = frozenset("*?[")
+
+_REGEX_PREFIX = "re:"
+
+
+def _match_pattern(pattern, jobs):
+    if pattern.startswith(_REGEX_PREFIX):
+        regex = re.compile(pattern[len(_REGEX_PREFIX):])
+        return [job for job in jobs if regex.search(job)]
+    if _GLOB_CHARACTERS.intersection(pattern):
+        regex = re.compile(fnmatch.translate(pattern))
+        return [job for job in jobs if regex.match(job)]
+    return None
+
+
+def select_jobs(job_config, patterns=(), templates=(), chunks=()):
+    """
+    Select jobs from a job configuration.
+
+    Arguments:
+    job_config - A JobConfigs instance.
+    patterns - Job names, globs, or regular expressions prefixed with "re:".
+    templates - The names of templates.  Jobs built from any of them are
+                selected.
+    chunks - Paths to chunk files.  Jobs built from any of them are selected.
+
+    Returns:
+    A list of the selected job names.  Jobs named explicitly come first in
+    the order given; everything else is in job configuration order.
+
+    An exception is raised if any filter doesn't select a job, or if chunks
+    are given and a job's chunks can't be resolved.
+    """
+    available = job_config.get_jobs()
+    selected = {}
+    for pattern in patterns:
+        matches = _match_pattern(pattern, available)
+        if matches is None:
+            if not job_config.has_job(pattern):
+                raise Exception("{} is not a valid job".format(pattern))
+            matches = [pattern]
+        elif not matches:
+            raise Exception("{} doesn't match any jobs".format(pattern))
+        selected.update(dict.fromkeys(matches))
+
+    users = set()
+    if templates:
+        template_jobs = {}
+        for job in available:
+            template_jobs.setdefault(
+                job_config.get_job_options(job).get('template'),
+                []).append(job)
+        for template in templates:
+            if template not in template_jobs:
+                raise Exception("No jobs use template {}".format(template))
+            users.update(template_jobs[template])
+
+    if chunks:
+        index = pennyworth.dependencies.build_index(job_config)
+        failures = index.get_failures()
+        if failures:
+            # any of these jobs could be built from the chunks
+            raise Exception("Failed to resolve chunks for {}".format(
+                ", ".join("{} ({})".format(job, failures[job])
+                          for job in sorted(failures))))
+        for chunk in chunks:
+            chunk_jobs = index.get_chunk_jobs(chunk)
+            if not chunk_jobs:
+                raise Exception("No jobs are built from {}".format(chunk))
+            users.update(chunk_jobs)
+    selected.update(dict.fromkeys(job for job in available if job in users))
+    return list(selected)
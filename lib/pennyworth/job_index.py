@@ -0,0 +1,131 @@
+#!/usr/bin/python3
+
+"""
+Keep a compiled copy of jobs.conf between runs.
+
+Parsing a large jobs.conf and evaluating its interpolation is a noticeable
+part of every command's startup.  A compiled index holds the result: every
+job's resolved options, which build method it uses, and its substitution
+table.  The index is written as JSON next to other cached data and reused as
+long as the source file hasn't changed.
+
+The source file's modification time and size are checked first.  If those
+changed, the file is hashed, so touching jobs.conf without editing it doesn't
+force a rebuild.
+"""
+
+import configparser
+import hashlib
+import json
+import os
+import re
+
+import pennyworth.config
+import pennyworth.paths
+
+# Bump this whenever the layout of a compiled index changes, so old indexes
+# are ignored.
+_INDEX_VERSION = 1
+
+BUILD_METHODS = ('chunks', 'template')
+
+_OPTION_PATTERN = re.compile(R"^sub\.")
+
+
+def _compile_section(section):
+    options = dict(section.items())
+    subs = {}
+    for option, value in options.items():
+        match = _OPTION_PATTERN.match(option)
+        if match:
+            subs[option[match.end():].upper()] = value
+    return {
+        'options': options,
+        'methods': [option for option in options if option in BUILD_METHODS],
+        'subs': subs
+    }
+
+
+def compile_index(config):
+    """
+    Compile a parsed job configuration.
+
+    Arguments:
+    config - A ConfigParser containing a job configuration.
+
+    Returns:
+    A dictionary with a 'jobs' key mapping each job's name to its compiled
+    form.  Jobs whose options can't be interpolated are recorded with an
+    'error' instead, so the failure is only reported if the job is used.
+    """
+    jobs = {}
+    for job in config.sections():
+        try:
+            jobs[job] = _compile_section(config[job])
+        except configparser.Error as failure:
+            jobs[job] = {'error': str(failure)}
+    return {'jobs': jobs}
+
+
+def _file_hash(path):
+    with open(path, 'rb') as input_file:
+        return hashlib.sha256(input_file.read()).hexdigest()
+
+
+def _index_path(config_path):
+    key = hashlib.sha256(
+        os.path.abspath(config_path).encode('utf-8')).hexdigest()
+    return os.path.join(pennyworth.paths.get_cache_root(), "jobs",
+                        "{}.json".format(key))
+
+
+def _read_index(index_path):
+    try:
+        with open(index_path) as index_file:
+            index = json.load(index_file)
+    except (OSError, ValueError):
+        return None
+    if index.get('version') != _INDEX_VERSION:
+        return None
+    return index
+
+
+def _write_index(index_path, index):
+    try:
+        pennyworth.config.write_atomically(index_path, json.dumps(index))
+    except OSError:
+        # the index is only an optimization, so failing to save it isn't
+        # worth stopping for
+        pass
+
+
+def load_index(config_path):
+    """
+    Load the compiled index of a job configuration file.
+
+    Arguments:
+    config_path - Filesystem path to a job configuration file.
+
+    Returns:
+    A compiled index like compile_index returns.  The cached copy is used
+    if config_path hasn't changed since it was compiled.
+    """
+    signature = pennyworth.config.file_signature(config_path)
+    if signature is None:
+        # nothing to cache; reading a missing file yields no jobs
+        return compile_index(pennyworth.config.read_config(config_path))
+
+    index_path = _index_path(config_path)
+    index = _read_index(index_path)
+    if index and index['signature'] == list(signature):
+        return index
+
+    digest = _file_hash(config_path)
+    if index and index['hash'] == digest:
+        index['signature'] = list(signature)
+    else:
+        index = compile_index(pennyworth.config.read_config(config_path))
+        index.update({'version': _INDEX_VERSION, 'hash': digest,
+                      'signature': list(signature)})
+    _write_index(index_path, index)
+    return index
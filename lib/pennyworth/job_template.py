@@ -6,6 +6,7 @@ import os.path
 
 import pennyworth.config
 import pennyworth.paths
+import pennyworth.timings
 
 
 class JobTemplate:
@@ -37,19 +38,104 @@ class JobTemplate:
         return self._config
 
 
-def get_job_template(template_name):
+class TemplateCache:
+    """
+    A cache of parsed templates.conf files.
+
+    Many jobs tend to share a handful of templates, so each templates.conf is
+    only parsed once.  A file is parsed again if its modification time or size
+    changes, which keeps the cache correct in long-running processes.
+    """
+
+    def __init__(self):
+        self._configs = {}
+        self._stats = {
+            'parses': 0,
+            'hits': 0
+        }
+
+    def get_config(self, path):
+        """
+        Retrieve the parsed contents of a templates.conf.
+
+        Arguments:
+        path - The templates.conf to load.
+
+        Returns:
+        The parsed configuration.
+        """
+        signature = pennyworth.config.file_signature(path)
+        entry = self._configs.get(path)
+        if entry and entry[0] == signature:
+            self._stats['hits'] += 1
+            pennyworth.timings.count("template_cache.hits")
+            return entry[1]
+        template_config = pennyworth.config.read_config(path)
+        self._stats['parses'] += 1
+        pennyworth.timings.count("template_cache.misses")
+        self._configs[path] = (signature, template_config)
+        return template_config
+
+    def get_stats(self):
+        """
+        Retrieve cache statistics.
+
+        Returns:
+        A dictionary with the number of parses performed and the number of
+        parses avoided (hits).
+        """
+        return dict(self._stats)
+
+
+_TEMPLATE_CACHE = TemplateCache()
+
+
+def get_template_cache():
+    """
+    Retrieve the TemplateCache used by get_job_template by default.
+
+    Returns:
+    The shared TemplateCache.
+    """
+    return _TEMPLATE_CACHE
+
+
+def _split_template_name(template_name):
+    path_parts = template_name.split('/')
+    template_folder = os.path.join(
+        pennyworth.paths.get_config_root(), *path_parts[:-1])
+    return template_folder, path_parts[-1]
+
+
+def get_template_path(template_name):
+    """
+    Retrieve the path of the templates.conf defining a template.
+
+    Arguments:
+    template_name - The template to locate.
+
+    Returns:
+    The path to the templates.conf that should define template_name.
+    """
+    template_folder, _ = _split_template_name(template_name)
+    return os.path.join(template_folder, 'templates.conf')
+
+
+@pennyworth.timings.timed("template lookup")
+def get_job_template(template_name, cache=None):
     """
     Retrieve a JobTemplate for a specific template.
 
     Arguments:
     template_name - The template to load.
+    cache - The TemplateCache to load templates.conf files from.  If None,
+            the shared cache from get_template_cache is used.
 
     Returns:
     A JobTemplate for template_name.
     """
-    path_parts = template_name.split('/')
-    template_folder = os.path.join(
-        pennyworth.paths.get_config_root(), *path_parts[:-1])
-    expected_path = os.path.join(template_folder, 'templates.conf')
-    template_config = pennyworth.config.read_config(expected_path)
-    return JobTemplate(template_folder, template_config[path_parts[-1]])
+    if cache is None:
+        cache = _TEMPLATE_CACHE
+    template_folder, name = _split_template_name(template_name)
+    template_config = cache.get_config(get_template_path(template_name))
+    return JobTemplate(template_folder, template_config[name])
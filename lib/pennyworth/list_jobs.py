@@ -11,7 +11,7 @@ class ListJobsCommand(pennyworth.command.HostCommand):
     def process(self, parsed_args):
         #print("{}\n\n{}".format(host, parsed_args))
         host = self.make_host(parsed_args)
-        for name in sorted(i[0] for i in host.list_jobs()):
+        for name in sorted(host.list_job_names(parsed_args.recursive)):
             print(name)
 
 
@@ -0,0 +1,39 @@
+#!/usr/bin/python3
+
+"""
+Normalize job configurations so they can be compared.
+
+Jenkins doesn't preserve the formatting of a configuration it's given, so a
+generated configuration and the copy Jenkins hands back are rarely identical
+strings even when they describe the same job.  Comparing normalized forms
+avoids treating those differences as changes.
+"""
+
+import xml.etree.ElementTree
+
+
+def _normalize_line_endings(config):
+    return config.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def normalize_config(config):
+    """
+    Normalize an XML job configuration.
+
+    The normalized form ignores line endings, the XML declaration, attribute
+    order, and whitespace surrounding text and elements.  Configurations that
+    aren't well-formed XML only have their line endings and surrounding
+    whitespace normalized.
+
+    Arguments:
+    config - An XML configuration as a string.
+
+    Returns:
+    A string that will be identical for equivalent configurations.
+    """
+    config = _normalize_line_endings(config)
+    try:
+        return xml.etree.ElementTree.canonicalize(config, strip_text=True)
+    except xml.etree.ElementTree.ParseError:
+        return config.strip()
+
@@ -7,3 +7,7 @@ _DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".pennyworth.d")
 
 def get_config_root():
     return _DEFAULT_PATH
+
+
+def get_cache_root():
+    return os.path.join(get_config_root(), "cache")
@@ -4,7 +4,31 @@
 Handle loading pennyworth plugins.
 """
 
-import pkg_resources
+import importlib.metadata
+
+
+def _iter_entry_points(entry_point_name):
+    entry_points = importlib.metadata.entry_points()
+    if hasattr(entry_points, 'select'):
+        return entry_points.select(group=entry_point_name)
+    # Python versions before 3.10 return a dictionary of groups
+    return entry_points.get(entry_point_name, [])
+
+
+def find_plugins(entry_point_name):
+    """
+    Find everything with a specific entry_point without loading anything.
+    Results will be returned as a dictionary, with the name as the key and the
+    (unloaded) entry_point as the value.  Call load() on an entry_point to
+    import it.
+
+    Arguments:
+    entry_point_name - the name of the entry_point to populate
+    """
+    entries = {}
+    for entry_point in _iter_entry_points(entry_point_name):
+        entries[entry_point.name] = entry_point
+    return entries
 
 
 def query_plugins(entry_point_name):
@@ -16,7 +40,5 @@ def query_plugins(entry_point_name):
     Arguments:
     entry_point_name - the name of the entry_point to populate
     """
-    entries = {}
-    for entry_point in pkg_resources.iter_entry_points(entry_point_name):
-        entries[entry_point.name] = entry_point.load()
-    return entries
+    return {name: entry_point.load()
+            for name, entry_point in find_plugins(entry_point_name).items()}
@@ -2,27 +2,117 @@
 
 """Code to support the sync command."""
 
+import sys
+
 import pennyworth.command
+import pennyworth.executor
 import pennyworth.host
 import pennyworth.integrate
 import pennyworth.job_config
+import pennyworth.normalize
+
+
+def _was_created(host, name):
+    def _check(failure):
+        # A create that timed out may still have gone through, in which case
+        # retrying it is rejected because the job already exists.
+        if not isinstance(failure, pennyworth.host.HostError) or \
+                failure.response.status_code != 400:
+            return False
+        try:
+            host.get_job_config(name)
+        except Exception:  # pylint: disable=broad-except
+            return False
+        return True
+
+    return _check
+
 
+def _was_erased(failure):
+    # Likewise, an erase that timed out may have removed the job, so a retry
+    # finds nothing to erase.
+    return isinstance(failure, pennyworth.host.HostError) and \
+        failure.response.status_code == 404
 
-def _apply_jobs(host, jenkins_configs, generated_configs):
-    def _handler(name, first, second):
-        if first and second:
-            # both exist, so update jobs
-            host.change_job(name, second)
+
+def _plan_jobs(host, jenkins_configs, generated_configs):
+    plan = pennyworth.integrate.Plan(jenkins_configs, generated_configs,
+                                     pennyworth.normalize.normalize_config)
+    operations = []
+    for name, first, second in plan.differences():
+        if first is None:
+            operations.append(pennyworth.executor.Operation(
+                "create", name, host.create_job, name, second,
+                already_done=_was_created(host, name)))
+        elif second is None:
+            operations.append(pennyworth.executor.Operation(
+                "erase", name, host.erase_job, name,
+                already_done=_was_erased))
         else:
-            # only one exists
-            if first:
-                # job was removed
-                host.erase_job(name)
-            else:
-                # new job
-                host.create_job(name, second)
+            operations.append(pennyworth.executor.Operation(
+                "update", name, host.change_job, name, second))
+    return operations, plan
+
+
+def _print_plan(operations, plan):
+    for operation in operations:
+        print("{} {}".format(operation.action, operation.name))
+    counts = plan.get_counts()
+    print("{} to create, {} to update, {} to erase, {} unchanged".format(
+        counts["added"], counts["changed"], counts["removed"],
+        counts["unchanged"]))
+
 
-    pennyworth.integrate.compare(jenkins_configs, generated_configs, _handler)
+def sync_host(host, generated_configs, recursive=False, dry_run=False,
+              selected_jobs=None):
+    """
+    Make the jobs on a host match generated configurations.
+
+    Arguments:
+    host - The Host to sync.
+    generated_configs - A dictionary of generated job configurations.
+    recursive - If True, include jobs in nested folders.
+    dry_run - If True, plan the changes without making them.
+    selected_jobs - If provided, only these jobs are retrieved from the host,
+                    so no other jobs can be changed or erased.
+
+    Returns:
+    A tuple containing 1) the list of planned Operations, 2) the Plan they
+    came from, and 3) the list of Results (None for a dry run).  Pass it to
+    print_outcome to report what happened.
+    """
+    # Cached configurations can be out of date if jobs were changed in
+    # Jenkins, and sync would then leave those jobs alone, so sync always
+    # compares against what's actually on the host.
+    jenkins_configs = pennyworth.host.get_host_configs(
+        host, recursive, selected_jobs, use_cache=False)
+    operations, plan = _plan_jobs(host, jenkins_configs, generated_configs)
+    results = None
+    if not dry_run:
+        results = pennyworth.executor.run_operations(
+            operations, workers=host.get_workers(),
+            rate=host.get_rate_limit(), retries=host.get_retries(),
+            retryable=pennyworth.host.is_transient_failure)
+    return operations, plan, results
+
+
+def print_outcome(operations, plan, results):
+    """
+    Print what sync_host did (or would do).
+
+    Arguments are the values sync_host returns.
+
+    Returns:
+    A message describing failed changes, or None if nothing failed.
+    """
+    if results is None:
+        _print_plan(operations, plan)
+        return None
+    failures = pennyworth.executor.print_summary(results)
+    print("unchanged: {}".format(len(plan.unchanged)))
+    if failures:
+        return "{} of {} changes failed".format(failures, len(results))
+    return None
 
 
 class SyncCommand(pennyworth.command.HostCommand):
@@ -31,7 +121,15 @@ class SyncCommand(pennyworth.command.HostCommand):
     def __init__(self):
         super().__init__(prog="pennyworth sync",
                          description="Sync generated configurations with "
-                                     "Jenkins")
+                                     "Jenkins",
+                         multiple_hosts=True)
+        pennyworth.command.add_job_filters(self)
+        pennyworth.command.add_incremental_argument(self)
+        pennyworth.command.add_strict_argument(self)
+        pennyworth.command.add_processes_argument(self)
+        self.add_argument("--dry-run", action="store_true",
+                          help="Show the changes that would be made without "
+                               "making them.")
 
     def process(self, parsed_args):
         """
@@ -40,10 +138,36 @@ class SyncCommand(pennyworth.command.HostCommand):
         Arguments
         parsed_args - Parsed command-line arguments
         """
-        host = self.make_host(parsed_args)
-        jenkins_configs = pennyworth.host.get_host_configs(host)
-        generated_configs = pennyworth.job_config.generate_configs()
-        _apply_jobs(host, jenkins_configs, generated_configs)
+        hosts = self.make_hosts(parsed_args)
+        selector = pennyworth.command.make_job_selector(parsed_args)
+        generated_configs = pennyworth.job_config.generate_configs(
+            parsed_args.incremental, parsed_args.strict,
+            parsed_args.processes, selector)
+        # with a filter, only the selected jobs are fetched (and so nothing
+        # else can be erased)
+        selected_jobs = list(generated_configs) if selector else None
+
+        def _sync(host):
+            return sync_host(host, generated_configs, parsed_args.recursive,
+                             parsed_args.dry_run, selected_jobs)
+
+        if len(hosts) == 1:
+            failure = print_outcome(*_sync(hosts[0][1]))
+            if failure:
+                raise Exception(failure)
+            return
+
+        failed_hosts = 0
+        for name, outcome, error in pennyworth.command.run_on_hosts(
+                hosts, _sync):
+            print("{}:".format(name))
+            failure = str(error) if error else print_outcome(*outcome)
+            if failure:
+                print("Error: {}: {}".format(name, failure), file=sys.stderr)
+                failed_hosts += 1
+        if failed_hosts:
+            raise Exception("{} of {} hosts failed".format(
+                failed_hosts, len(hosts)))
 
 
 def main(args=None):
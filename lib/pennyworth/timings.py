@@ -0,0 +1,249 @@
+#!/usr/bin/python3
+
+"""
+Record where a command spends its time.
+
+Instrumentation is off unless a command is run with --timings (or the
+PENNYWORTH_TIMINGS environment variable is set), so the hooks left in hot
+paths only cost a flag check.  When enabled, every phase records its call
+count and total wall time, counters track things like HTTP requests and
+cache hits, and a report is printed to standard error when the command
+finishes.
+
+Phases can overlap: a phase running on several threads at once accumulates
+the time spent on each of them, and phases nest (e.g., "substitute" is part
+of "generate").  Work done in other processes (e.g., generating with
+--jobs) is only counted as a whole.
+
+A cProfile dump can be written with --profile (or PENNYWORTH_PROFILE) for
+deeper analysis with pstats or a viewer like snakeviz.
+"""
+
+import contextlib
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+
+TIMINGS_VARIABLE = "PENNYWORTH_TIMINGS"
+PROFILE_VARIABLE = "PENNYWORTH_PROFILE"
+
+_STATE = {
+    'enabled': False
+}
+_LOCK = threading.Lock()
+_PHASES = {}
+_COUNTERS = {}
+
+
+def enable():
+    """Start recording timings."""
+    _STATE['enabled'] = True
+
+
+def enabled():
+    """Check if timings are being recorded."""
+    return _STATE['enabled']
+
+
+def reset():
+    """Forget everything recorded so far."""
+    with _LOCK:
+        _PHASES.clear()
+        _COUNTERS.clear()
+
+
+def add_time(name, elapsed):
+    """
+    Record a call to a phase.
+
+    Arguments:
+    name - The phase's name.
+    elapsed - Seconds the call took.
+    """
+    with _LOCK:
+        entry = _PHASES.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+
+
+def count(name, amount=1):
+    """
+    Increase a counter.
+
+    Arguments:
+    name - The counter's name.
+    amount - How much to add.
+    """
+    if not _STATE['enabled']:
+        return
+    with _LOCK:
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + amount
+
+
+@contextlib.contextmanager
+def phase(name):
+    """
+    Time a block of code.
+
+    Arguments:
+    name - The phase's name.
+    """
+    if not _STATE['enabled']:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """
+    Decorate a function so every call is timed as a phase.
+
+    Generator functions are timed too, but only while they're producing
+    items; time the caller spends between items doesn't count.
+
+    Arguments:
+    name - The phase's name.
+    """
+    def _decorator(function):
+        if inspect.isgeneratorfunction(function):
+            return _time_generator(name, function)
+
+        @functools.wraps(function)
+        def _wrapper(*args, **kwargs):
+            if not _STATE['enabled']:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                add_time(name, time.perf_counter() - start)
+
+        return _wrapper
+
+    return _decorator
+
+
+def _time_generator(name, function):
+    @functools.wraps(function)
+    def _wrapper(*args, **kwargs):
+        if not _STATE['enabled']:
+            yield from function(*args, **kwargs)
+            return
+        generator = function(*args, **kwargs)
+        elapsed = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield item
+        finally:
+            generator.close()
+            add_time(name, elapsed)
+
+    return _wrapper
+
+
+def get_phases():
+    """
+    Retrieve recorded phases.
+
+    Returns:
+    A dictionary mapping phase names to tuples of their call count and total
+    seconds.
+    """
+    with _LOCK:
+        return {name: tuple(entry) for name, entry in _PHASES.items()}
+
+
+def get_counters():
+    """
+    Retrieve recorded counters.
+
+    Returns:
+    A dictionary mapping counter names to their values.
+    """
+    with _LOCK:
+        return dict(_COUNTERS)
+
+
+def print_report(output=None):
+    """
+    Print everything recorded.
+
+    Counters named "<name>.hits" and "<name>.misses" are also summarized as
+    a hit rate.
+
+    Arguments:
+    output - The file to print to.  Defaults to standard error.
+    """
+    if output is None:
+        output = sys.stderr
+    phases = get_phases()
+    counters = get_counters()
+    print("Timings:", file=output)
+    print("  {:30} {:>8} {:>10}".format("phase", "calls", "seconds"),
+          file=output)
+    for name, (calls, elapsed) in sorted(phases.items(),
+                                         key=lambda item: -item[1][1]):
+        print("  {:30} {:>8} {:>10.3f}".format(name, calls, elapsed),
+              file=output)
+    if counters:
+        print("Counters:", file=output)
+        for name in sorted(counters):
+            print("  {:30} {:>19}".format(name, counters[name]), file=output)
+    caches = sorted(set(name[:-len(".hits")] for name in counters
+                        if name.endswith(".hits")) |
+                    set(name[:-len(".misses")] for name in counters
+                        if name.endswith(".misses")))
+    if caches:
+        print("Cache hit rates:", file=output)
+        for cache in caches:
+            hits = counters.get(cache + ".hits", 0)
+            misses = counters.get(cache + ".misses", 0)
+            print("  {:30} {:>18.1f}%".format(
+                cache, 100.0 * hits / (hits + misses)), file=output)
+
+
+@contextlib.contextmanager
+def instrument(name, timings=False, profile=None):
+    """
+    Run a command with instrumentation.
+
+    Arguments:
+    name - The phase name for the whole command.
+    timings - If True, record timings and print a report afterwards.  The
+              PENNYWORTH_TIMINGS environment variable also enables them.
+    profile - A file to write cProfile statistics to.  Defaults to the
+              PENNYWORTH_PROFILE environment variable.
+    """
+    timings = timings or bool(os.environ.get(TIMINGS_VARIABLE))
+    profile = profile or os.environ.get(PROFILE_VARIABLE)
+    if timings:
+        enable()
+    profiler = None
+    if profile:
+        # pylint: disable=import-outside-toplevel
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        with phase(name):
+            yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile)
+        if timings:
+            print_report()
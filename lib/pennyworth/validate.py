@@ -2,7 +2,9 @@
 
 """Code to support the validate command."""
 
+import concurrent.futures
 import difflib
+import sys
 
 import pennyworth.command
 import pennyworth.host
@@ -10,11 +12,127 @@ import pennyworth.integrate
 import pennyworth.job_config
 
 
-def _print_diff(name, jenkins_lines, generated_lines):
-    diffs = difflib.unified_diff(jenkins_lines, generated_lines,
-                                 "jenkins/{}".format(name),
-                                 "generated/{}".format(name))
-    for diff in diffs:
+_CONTEXT = 3
+
+
+def _common_prefix(first_lines, second_lines, start=0):
+    count = start
+    for first, second in zip(first_lines[start:], second_lines[start:]):
+        if first != second:
+            break
+        count += 1
+    return count
+
+
+def _common_suffix(first_lines, second_lines, limit):
+    count = 0
+    while count < limit and \
+            first_lines[-1 - count] == second_lines[-1 - count]:
+        count += 1
+    return count
+
+
+def _format_range(start, stop):
+    # the same ranges difflib.unified_diff writes in hunk headers
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return str(beginning)
+    if not length:
+        beginning -= 1
+    return "{},{}".format(beginning, length)
+
+
+class _TrimmedMatcher(difflib.SequenceMatcher):
+    """
+    A SequenceMatcher that only compares the lines between the common prefix
+    and suffix.
+
+    Configurations are large and usually differ in a handful of places, so
+    this keeps difflib from spending quadratic time on the unchanged parts.
+    The prefix and suffix are reported as equal ranges, so hunks built by
+    get_grouped_opcodes() have the same context they would have otherwise.
+    """
+
+    def __init__(self, first_lines, second_lines):
+        super().__init__(None, first_lines, second_lines)
+        self._opcodes = None
+
+    def get_opcodes(self):
+        if self._opcodes is None:
+            self._opcodes = self._build_opcodes()
+        return self._opcodes
+
+    def _build_opcodes(self):
+        first_lines = self.a
+        second_lines = self.b
+        opcodes = []
+        # Jenkins rewrites the XML declaration, so don't let a different
+        # first line keep the rest of the common prefix from being trimmed.
+        head = 0
+        if first_lines and second_lines and \
+                first_lines[0] != second_lines[0] and \
+                first_lines[0].startswith("<?xml") and \
+                second_lines[0].startswith("<?xml"):
+            opcodes.append(('replace', 0, 1, 0, 1))
+            head = 1
+        prefix = _common_prefix(first_lines, second_lines, head)
+        suffix = _common_suffix(
+            first_lines, second_lines,
+            min(len(first_lines), len(second_lines)) - prefix)
+        first_end = len(first_lines) - suffix
+        second_end = len(second_lines) - suffix
+
+        def _add(tag, i1, i2, j1, j2):
+            if opcodes and tag == 'equal' and opcodes[-1][0] == 'equal':
+                i1, j1 = opcodes.pop()[1::2]
+            opcodes.append((tag, i1, i2, j1, j2))
+
+        if prefix > head:
+            _add('equal', head, prefix, head, prefix)
+        matcher = difflib.SequenceMatcher(
+            None, first_lines[prefix:first_end],
+            second_lines[prefix:second_end])
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            _add(tag, i1 + prefix, i2 + prefix, j1 + prefix, j2 + prefix)
+        if suffix:
+            _add('equal', first_end, len(first_lines), second_end,
+                 len(second_lines))
+        return opcodes
+
+
+def _diff_lines(name, first, second, label):
+    first_lines = first.split('\n') if first else []
+    second_lines = second.split('\n') if second else []
+
+    # This builds the same output as difflib.unified_diff, but with a matcher
+    # that skips the unchanged start and end of each configuration.
+    matcher = _TrimmedMatcher(first_lines, second_lines)
+    lines = []
+    for group in matcher.get_grouped_opcodes(_CONTEXT):
+        if not lines:
+            lines.append("--- {}/{}\n".format(label, name))
+            lines.append("+++ generated/{}\n".format(name))
+        lines.append("@@ -{} +{} @@\n".format(
+            _format_range(group[0][1], group[-1][2]),
+            _format_range(group[0][3], group[-1][4])))
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                lines.extend(" " + line for line in first_lines[i1:i2])
+                continue
+            if tag in ('replace', 'delete'):
+                lines.extend("-" + line for line in first_lines[i1:i2])
+            if tag in ('replace', 'insert'):
+                lines.extend("+" + line for line in second_lines[j1:j2])
+    return lines
+
+
+def _diff_job(job):
+    return _diff_lines(*job)
+
+
+def _print_diff(lines):
+    for diff in lines:
         # The issue is that control lines (file lines, line offsets) have a
         # trailing newline but the actual diff lines (both differences and
         # context lines) do not.  Since some of the diff tools I've trid get
@@ -26,18 +144,58 @@ def _print_diff(name, jenkins_lines, generated_lines):
             print(diff)
 
 
-def _print_diffs(jenkins_configs, generated_configs):
-    def _handler(name, first, second):
-        first_lines = []
-        second_lines = []
-        if first:
-            first_lines = first.split('\n')
-        if second:
-            second_lines = second.split('\n')
+def _count_changes(lines):
+    added = 0
+    removed = 0
+    # skip the file lines so they aren't counted as changes
+    for diff in lines[2:]:
+        if diff.startswith('+'):
+            added += 1
+        elif diff.startswith('-'):
+            removed += 1
+    return added, removed
+
 
-        _print_diff(name, first_lines, second_lines)
+def print_diffs(jenkins_configs, generated_configs, label="jenkins",
+                summary=False, processes=1):
+    """
+    Print the differences between two sets of job configurations.
+
+    Arguments:
+    jenkins_configs - Configurations retrieved from Jenkins.
+    generated_configs - Configurations generated by pennyworth.
+    label - The name to give the Jenkins side of each diff.
+    summary - If True, only print how many lines changed in each job.
+    processes - The number of processes to compute diffs with.
+
+    Returns:
+    A tuple containing the number of jobs that differ and the number of jobs
+    compared.
+    """
+    plan = pennyworth.integrate.Plan(jenkins_configs, generated_configs)
+    jobs = [(name, first, second, label)
+            for name, first, second in plan.differences()]
 
-    pennyworth.integrate.compare(jenkins_configs, generated_configs, _handler)
+    if processes > 1 and len(jobs) > 1:
+        with concurrent.futures.ProcessPoolExecutor(processes) as pool:
+            diffs = list(pool.map(_diff_job, jobs,
+                                  chunksize=max(len(jobs) // processes // 4,
+                                                1)))
+    else:
+        diffs = map(_diff_job, jobs)
+
+    different = 0
+    for job, lines in zip(jobs, diffs):
+        if not lines:
+            continue
+        different += 1
+        if summary:
+            print("{}: +{} -{}".format(job[0], *_count_changes(lines)))
+        else:
+            _print_diff(lines)
+    if summary:
+        print("{} of {} jobs differ".format(different, len(plan)))
+    return different, len(plan)
 
 
 class ValidateCommand(pennyworth.command.HostCommand):
@@ -48,7 +206,17 @@ class ValidateCommand(pennyworth.command.HostCommand):
     def __init__(self):
         super().__init__(prog="pennyworth validate",
                          description="Compare generated job configurations "
-                                     "with what's actually in Jenkins")
+                                     "with what's actually in Jenkins",
+                         multiple_hosts=True)
+        pennyworth.command.add_job_filters(self)
+        pennyworth.command.add_refresh_argument(self)
+        pennyworth.command.add_incremental_argument(self)
+        pennyworth.command.add_strict_argument(self)
+        pennyworth.command.add_processes_argument(
+            self, "generate and compare jobs")
+        self.add_argument("--summary", action="store_true",
+                          help="Only list the jobs that differ and how many "
+                               "lines were added and removed.")
 
     def process(self, parsed_args):
         """
@@ -57,10 +225,44 @@ class ValidateCommand(pennyworth.command.HostCommand):
         Arguments
         parsed_args - Parsed command-line arguments
         """
-        host = self.make_host(parsed_args)
-        jenkins_configs = pennyworth.host.get_host_configs(host)
-        generated_configs = pennyworth.job_config.generate_configs()
-        _print_diffs(jenkins_configs, generated_configs)
+        hosts = self.make_hosts(parsed_args)
+        selector = pennyworth.command.make_job_selector(parsed_args)
+        generated_configs = pennyworth.job_config.generate_configs(
+            parsed_args.incremental, parsed_args.strict,
+            parsed_args.processes, selector)
+        # with a filter, only the selected jobs are fetched and compared
+        selected_jobs = list(generated_configs) if selector else None
+        if len(hosts) == 1:
+            jenkins_configs = pennyworth.host.get_host_configs(
+                hosts[0][1], parsed_args.recursive, selected_jobs)
+            print_diffs(jenkins_configs, generated_configs,
+                        summary=parsed_args.summary,
+                        processes=parsed_args.processes)
+            return
+
+        def _fetch(host):
+            return pennyworth.host.get_host_configs(
+                host, parsed_args.recursive, selected_jobs)
+
+        # fetch from every host at once, but keep each host's diffs together
+        failed_hosts = 0
+        for name, jenkins_configs, error in pennyworth.command.run_on_hosts(
+                hosts, _fetch):
+            if error:
+                print("Error: {}: {}".format(name, error), file=sys.stderr)
+                failed_hosts += 1
+            else:
+                if parsed_args.summary:
+                    print("{}:".format(name))
+                different, total = print_diffs(
+                    jenkins_configs, generated_configs, name,
+                    parsed_args.summary, parsed_args.processes)
+                if not parsed_args.summary:
+                    print("{}: {} of {} jobs differ".format(
+                        name, different, total))
+        if failed_hosts:
+            raise Exception("{} of {} hosts failed".format(
+                failed_hosts, len(hosts)))
 
 
 def main(args=None):
@@ -0,0 +1,394 @@
+#!/usr/bin/python3
+
+"""
+Code to support the watch command.
+
+The watch command keeps job configurations, templates, and chunks in memory
+and rebuilds only the jobs affected by each change.  Changes are noticed with
+inotify where it's available (Linux) and by polling file signatures
+everywhere else.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+import pennyworth.command
+import pennyworth.config
+import pennyworth.dependencies
+import pennyworth.host
+import pennyworth.job_config
+import pennyworth.sync
+import pennyworth.validate
+
+_JOBS_CONF = 'jobs.conf'
+
+# inotify event masks from <sys/inotify.h>
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_WATCH_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM |
+                  _IN_MOVED_TO | _IN_CREATE | _IN_DELETE)
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _PollingWatcher:
+    """
+    Notice changes by checking each file's modification time and size.
+
+    Arguments:
+    interval - Seconds between checks.
+    """
+
+    def __init__(self, interval):
+        self._interval = interval
+        self._signatures = {}
+
+    def update(self, paths):
+        """
+        Set the files being watched.
+
+        Arguments:
+        paths - The absolute paths of every file to watch.
+        """
+        self._signatures = {
+            path: self._signatures.get(
+                path, pennyworth.config.file_signature(path))
+            for path in paths
+        }
+
+    def wait(self, timeout=None):
+        """
+        Wait for watched files to change.
+
+        Arguments:
+        timeout - The most seconds to wait, or None to wait until something
+                  changes.
+
+        Returns:
+        A set of the paths that changed (empty if timeout expired).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = set()
+            for path, signature in self._signatures.items():
+                current = pennyworth.config.file_signature(path)
+                if current != signature:
+                    self._signatures[path] = current
+                    changed.add(path)
+            if changed:
+                return changed
+            delay = self._interval
+            if deadline is not None:
+                delay = min(delay, deadline - time.monotonic())
+                if delay <= 0:
+                    return changed
+            time.sleep(delay)
+
+    def close(self):
+        """Stop watching."""
+
+
+class _InotifyWatcher:
+    """
+    Notice changes with inotify.
+
+    Directories are watched rather than files, so files replaced by renaming
+    (which many editors do) are still noticed.
+
+    Arguments:
+    libc - The C library providing the inotify functions.
+    """
+
+    def __init__(self, libc):
+        self._libc = libc
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._folders = {}
+        self._paths = set()
+
+    def update(self, paths):
+        """
+        Set the files being watched.
+
+        Arguments:
+        paths - The absolute paths of every file to watch.
+        """
+        self._paths = set(paths)
+        folders = set(os.path.dirname(path) for path in self._paths)
+        # stop watching folders jobs no longer depend on
+        for descriptor, folder in list(self._folders.items()):
+            if folder not in folders:
+                self._libc.inotify_rm_watch(self._fd, descriptor)
+                del self._folders[descriptor]
+        watched = set(self._folders.values())
+        for folder in folders:
+            if folder in watched:
+                continue
+            descriptor = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(folder), _IN_WATCH_MASK)
+            # a folder that doesn't exist yet can't be watched; there's
+            # nothing in it to build from anyway
+            if descriptor >= 0:
+                self._folders[descriptor] = folder
+
+    def _read_events(self):
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                descriptor, _, _, length = _EVENT_HEADER.unpack_from(
+                    data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                folder = self._folders.get(descriptor)
+                if folder and name:
+                    path = os.path.join(folder, os.fsdecode(name))
+                    if path in self._paths:
+                        changed.add(path)
+
+    def wait(self, timeout=None):
+        """
+        Wait for watched files to change.
+
+        Arguments:
+        timeout - The most seconds to wait, or None to wait until something
+                  changes.
+
+        Returns:
+        A set of the paths that changed (empty if timeout expired).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None
+            if deadline is not None:
+                remaining = max(deadline - time.monotonic(), 0)
+            ready, _, _ = select.select([self._fd], [], [], remaining)
+            if not ready:
+                return set()
+            changed = self._read_events()
+            # events for files that aren't watched don't count
+            if changed or (deadline is not None and
+                           time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        """Stop watching."""
+        os.close(self._fd)
+
+
+def _make_watcher(interval, polling=False):
+    if not polling and sys.platform.startswith('linux'):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if hasattr(libc, 'inotify_init1'):
+            try:
+                return _InotifyWatcher(libc)
+            except OSError:
+                pass
+    return _PollingWatcher(interval)
+
+
+class _Builder:
+    """
+    Rebuild jobs as the files they're built from change.
+
+    Arguments:
+    selector - A function to select jobs from a JobConfigs instance, or None
+               to use every job.
+    strict - If True, report jobs with unresolved substitutions as failures.
+    """
+
+    def __init__(self, selector, strict):
+        self._selector = selector
+        self._strict = strict
+        self._jobs_conf = os.path.abspath(_JOBS_CONF)
+        self._cache = pennyworth.job_config.ChunkCache(revalidate=True)
+        self._dependencies = pennyworth.dependencies.DependencyIndex()
+        self._job_config = None
+        self._jobs = []
+        self._options = {}
+
+    def _load(self):
+        job_config = pennyworth.job_config.make_configs(_JOBS_CONF)
+        jobs = job_config.get_jobs()
+        if self._selector:
+            jobs = self._selector(job_config)
+        options = {job: job_config.get_job_options(job) for job in jobs}
+        return job_config, jobs, options
+
+    def get_files(self):
+        """Retrieve every file that should be watched."""
+        return [self._jobs_conf] + self._dependencies.get_files()
+
+    def _build(self, jobs):
+        configs = {}
+        failures = {}
+        for job in jobs:
+            pennyworth.dependencies.update_index(self._dependencies,
+                                                 self._job_config, job)
+            try:
+                configs[job] = pennyworth.job_config.generate_config(
+                    self._job_config, job, self._cache, strict=self._strict)
+            except Exception as failure:  # pylint: disable=broad-except
+                failures[job] = failure
+        return configs, failures
+
+    def build_all(self):
+        """
+        Build every job.
+
+        Returns:
+        A tuple containing a dictionary of generated configurations and a
+        dictionary of jobs that failed to build and their errors.
+        """
+        self._job_config, self._jobs, self._options = self._load()
+        return self._build(self._jobs)
+
+    def rebuild(self, changed):
+        """
+        Rebuild the jobs affected by changed files.
+
+        Arguments:
+        changed - The absolute paths of files that changed.
+
+        Returns:
+        A tuple like build_all returns, containing only the affected jobs.
+        """
+        affected = set()
+        for path in changed:
+            affected.update(self._dependencies.get_file_jobs(path))
+        if self._jobs_conf in changed:
+            job_config, jobs, options = self._load()
+            for job in self._jobs:
+                if job not in options:
+                    self._dependencies.remove_job(job)
+                    affected.discard(job)
+            affected.update(job for job in jobs
+                            if options[job] != self._options.get(job))
+            self._job_config, self._jobs, self._options = (
+                job_config, jobs, options)
+        return self._build([job for job in self._jobs if job in affected])
+
+
+class WatchCommand(pennyworth.command.HostCommand):
+    """
+    A command to rebuild jobs whenever the files they're built from change.
+    """
+
+    def __init__(self):
+        super().__init__(prog="pennyworth watch",
+                         description="Rebuild jobs as their files change")
+        pennyworth.command.add_job_filters(self)
+        pennyworth.command.add_strict_argument(self)
+        self.add_argument("--output-dir",
+                          default=None,
+                          help="Write each rebuilt job to <output-dir>/<job>/"
+                               "config.xml.")
+        action = self.parser.add_mutually_exclusive_group()
+        action.add_argument("--validate", action="store_true",
+                            help="Compare rebuilt jobs with Jenkins.")
+        action.add_argument("--sync", action="store_true",
+                            help="Sync rebuilt jobs with Jenkins.")
+        self.add_argument("--debounce", type=float, default=0.2,
+                          help="Seconds to wait for changes to settle before "
+                               "rebuilding.")
+        self.add_argument("--interval", type=float, default=0.5,
+                          help="Seconds between checks when polling for "
+                               "changes.")
+        self.add_argument("--poll", action="store_true",
+                          help="Poll for changes even if inotify is "
+                               "available.")
+
+    @staticmethod
+    def _report(parsed_args, host, configs, failures):
+        for job in sorted(failures):
+            print("Error: {}: {}".format(job, failures[job]), file=sys.stderr)
+        for name, config in configs.items():
+            if parsed_args.output_dir:
+                pennyworth.config.write_atomically(
+                    os.path.join(parsed_args.output_dir, name, "config.xml"),
+                    config)
+        if not configs or not host:
+            return
+        if parsed_args.validate:
+            jenkins_configs = pennyworth.host.get_host_configs(
+                host, parsed_args.recursive, list(configs))
+            pennyworth.validate.print_diffs(jenkins_configs, configs,
+                                            summary=True)
+        elif parsed_args.sync:
+            failure = pennyworth.sync.print_outcome(
+                *pennyworth.sync.sync_host(host, configs,
+                                           parsed_args.recursive,
+                                           selected_jobs=list(configs)))
+            if failure:
+                print("Error: {}".format(failure), file=sys.stderr)
+
+    def process(self, parsed_args):
+        """
+        Process command-line arguments and execute the command.
+
+        Arguments
+        parsed_args - Parsed command-line arguments
+        """
+        host = None
+        if parsed_args.validate or parsed_args.sync:
+            host = self.make_host(parsed_args)
+        builder = _Builder(pennyworth.command.make_job_selector(parsed_args),
+                           parsed_args.strict)
+        watcher = _make_watcher(parsed_args.interval, parsed_args.poll)
+
+        def _run(build, *args, target=host):
+            start = time.monotonic()
+            try:
+                configs, failures = build(*args)
+                print("Built {} job(s) in {:.2f}s".format(
+                    len(configs), time.monotonic() - start))
+                self._report(parsed_args, target, configs, failures)
+            except Exception as failure:  # pylint: disable=broad-except
+                print("Error: {}".format(failure), file=sys.stderr)
+            sys.stdout.flush()
+            watcher.update(builder.get_files())
+
+        try:
+            # everything is built up front to fill the caches and learn each
+            # job's files, but Jenkins is only touched for later changes
+            _run(builder.build_all, target=None)
+            while True:
+                changed = watcher.wait()
+                while True:
+                    settled = watcher.wait(parsed_args.debounce)
+                    if not settled:
+                        break
+                    changed.update(settled)
+                _run(builder.rebuild, changed)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
+
+
+def main(args=None):
+    # pylint: disable=missing-docstring
+    watch = WatchCommand()
+    pennyworth.command.execute_command(watch, args)
+
+
+_WATCH_COMMAND = (main, "Rebuild jobs as their files change")
+
+if __name__ == '__main__':
+    main()
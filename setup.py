@@ -14,8 +14,11 @@ setup(
     packages=find_packages("lib"),
 
     install_requires=[
-        'jenkinsapi==0.3.6'
+        'requests'
     ],
+    extras_require={
+        'async': ['aiohttp']
+    },
 
     entry_points={
         "console_scripts": [
@@ -23,9 +26,11 @@ setup(
         ],
         'pennyworth.commands': [
             'build-jobs = pennyworth.build_jobs:_BUILD_JOBS_COMMAND',
+            'deps = pennyworth.deps:_DEPS_COMMAND',
             'list-jobs = pennyworth.list_jobs:_LIST_JOBS_COMMAND',
             'sync = pennyworth.sync:_SYNC_COMMAND',
-            'validate = pennyworth.validate:_VALIDATE_COMMAND'
+            'validate = pennyworth.validate:_VALIDATE_COMMAND',
+            'watch = pennyworth.watch:_WATCH_COMMAND'
         ],
     },
 
@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+
+"""Setup shared by the tests."""
+
+import os
+import unittest.mock
+
+import pennyworth.config
+import pennyworth.job_config
+import pennyworth.job_index
+
+
+def write_file(folder, name, data):
+    """
+    Write a file for a test.
+
+    Arguments:
+    folder - The folder to write in.
+    name - The file's name, relative to folder.  Missing folders are created.
+    data - The file's contents.
+
+    Returns:
+    The path of the file.
+    """
+    path = os.path.join(folder, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as output_file:
+        output_file.write(data)
+    return path
+
+
+def make_job_configs(folder, data):
+    """
+    Write a jobs.conf and load it.
+
+    Arguments:
+    folder - The folder to write jobs.conf in.
+    data - The contents of jobs.conf.
+
+    Returns:
+    A JobConfigs for the new jobs.conf.
+    """
+    jobs_conf = write_file(folder, "jobs.conf", data)
+    return pennyworth.job_config.JobConfigs(
+        pennyworth.job_index.compile_index(
+            pennyworth.config.read_config(jobs_conf)))
+
+
+def use_config_root(test, folder):
+    """
+    Look for templates in a different folder for the rest of a test.
+
+    Arguments:
+    test - The running TestCase.
+    folder - The folder to use as the configuration root.
+    """
+    patcher = unittest.mock.patch("pennyworth.paths._DEFAULT_PATH", folder)
+    patcher.start()
+    test.addCleanup(patcher.stop)
@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+import pennyworth.config_cache
+import pennyworth.host
+
+
+class TestConfigCache(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        self.cache = pennyworth.config_cache.ConfigCache(self.folder, 60)
+
+    def test_round_trip(self):
+        self.cache.set("a", "<a/>")
+        self.cache.save()
+        self.assertEqual(self.cache.get("a"), "<a/>")
+        self.assertIsNone(self.cache.get("missing"))
+        reloaded = pennyworth.config_cache.ConfigCache(self.folder, 60)
+        self.assertEqual(reloaded.get("a"), "<a/>")
+
+    def test_expiry(self):
+        with unittest.mock.patch("time.time", return_value=1000.0):
+            self.cache.set("a", "<a/>")
+        with unittest.mock.patch("time.time", return_value=1060.0):
+            self.assertEqual(self.cache.get("a"), "<a/>")
+        with unittest.mock.patch("time.time", return_value=1061.0):
+            self.assertIsNone(self.cache.get("a"))
+
+    def test_refresh(self):
+        self.cache.set("a", "<a/>")
+        self.cache.save()
+        refreshed = pennyworth.config_cache.ConfigCache(self.folder, 60,
+                                                        refresh=True)
+        self.assertIsNone(refreshed.get("a"))
+
+    def test_damaged_entry(self):
+        self.cache.set("a", "<a/>")
+        # pylint: disable=protected-access
+        with open(self.cache._job_path("a"), 'w') as job_file:
+            job_file.write("<b/>")
+        self.assertIsNone(self.cache.get("a"))
+
+    def test_evict(self):
+        # pylint: disable=protected-access
+        self.cache.set("a", "<a/>")
+        self.cache.set("b", "<b/>")
+        self.cache.evict({"b"})
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.get("b"), "<b/>")
+        self.assertEqual(sorted(os.listdir(self.folder)), [
+            os.path.basename(self.cache._job_path("b"))])
+
+
+class TestHostCache(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.cache = pennyworth.config_cache.ConfigCache(folder.name, 60)
+        self.host = pennyworth.host.Host("http://jenkins", cache=self.cache)
+        for method in ["_post", "_post_xml"]:
+            patcher = unittest.mock.patch.object(self.host, method)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_changes_discard_cached_configs(self):
+        for change in [self.host.change_job, self.host.create_job]:
+            self.cache.set("a", "<a/>")
+            change("a", "<b/>")
+            self.assertIsNone(self.cache.get("a"))
+        self.cache.set("a", "<a/>")
+        self.host.erase_job("a")
+        self.assertIsNone(self.cache.get("a"))
+
+    def _get_host_configs(self, **kwargs):
+        fetched = {"a": "<new/>", "b": "<b/>"}
+        with unittest.mock.patch.object(
+                self.host, "list_job_names", return_value=["a", "b"]), \
+                unittest.mock.patch.object(
+                    self.host, "get_job_configs",
+                    side_effect=lambda names, missing_ok: (
+                        {name: fetched[name] for name in names}, {})) as get:
+            configs = pennyworth.host.get_host_configs(self.host, **kwargs)
+        return configs, get.call_args.args[0]
+
+    def test_cached_configs_are_used(self):
+        self.cache.set("a", "<old/>")
+        configs, fetched = self._get_host_configs()
+        self.assertEqual(configs, {"a": "<old/>", "b": "<b/>"})
+        self.assertEqual(fetched, ["b"])
+
+    def test_bypassing_the_cache(self):
+        self.cache.set("a", "<old/>")
+        configs, fetched = self._get_host_configs(use_cache=False)
+        self.assertEqual(configs, {"a": "<new/>", "b": "<b/>"})
+        self.assertEqual(fetched, ["a", "b"])
+        self.assertEqual(self.cache.get("a"), "<new/>")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+
+import os
+import tempfile
+import unittest
+
+import pennyworth.dependencies
+import pennyworth.job_template
+
+import helpers
+
+
+class TestDependencyIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = pennyworth.dependencies.DependencyIndex()
+        self.index.set_job("a", ["/chunks/head.xml", "/chunks/a.xml"])
+        self.index.set_job("b", ["/chunks/head.xml", "/chunks/head.xml"],
+                           "shared/basic")
+
+    def test_chunks(self):
+        self.assertEqual(self.index.get_chunk_jobs("/chunks/head.xml"),
+                         {"a", "b"})
+        self.assertEqual(self.index.get_chunk_jobs("/chunks/a.xml"), {"a"})
+        self.assertEqual(self.index.get_job_chunks("b"), {"/chunks/head.xml"})
+        self.assertIsNone(self.index.get_job_chunks("missing"))
+        self.assertEqual(sorted(self.index.get_chunks()),
+                         ["/chunks/a.xml", "/chunks/head.xml"])
+
+    def test_templates(self):
+        template_path = pennyworth.job_template.get_template_path(
+            "shared/basic")
+        self.assertEqual(self.index.get_template_jobs("shared/basic"), {"b"})
+        self.assertEqual(self.index.get_job_template("b"), "shared/basic")
+        self.assertIsNone(self.index.get_job_template("a"))
+        self.assertEqual(self.index.get_file_jobs(template_path), {"b"})
+        self.assertIn(template_path, self.index.get_files())
+
+    def test_replace(self):
+        self.index.set_job("a", ["/chunks/other.xml"])
+        self.assertEqual(self.index.get_chunk_jobs("/chunks/a.xml"), set())
+        self.assertEqual(self.index.get_chunk_jobs("/chunks/head.xml"), {"b"})
+        self.assertNotIn("/chunks/a.xml", self.index.get_files())
+
+    def test_remove(self):
+        self.index.remove_job("b")
+        self.index.remove_job("missing")
+        self.assertEqual(self.index.get_templates(), [])
+        self.assertEqual(self.index.get_chunk_jobs("/chunks/head.xml"), {"a"})
+
+    def test_failures_keep_dependencies(self):
+        failure = Exception("broken")
+        self.index.set_failure("a", failure)
+        self.assertEqual(self.index.get_failures(), {"a": failure})
+        self.assertEqual(self.index.get_chunk_jobs("/chunks/a.xml"), {"a"})
+        self.index.set_job("a", ["/chunks/a.xml"])
+        self.index.remove_job("a")
+        self.assertEqual(self.index.get_failures(), {})
+
+
+class TestBuildIndex(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        helpers.use_config_root(self, self.folder)
+
+    def _path(self, *parts):
+        return os.path.join(self.folder, *parts)
+
+    def test_build(self):
+        job_config = helpers.make_job_configs(
+            self.folder,
+            "[plain]\nchunks = {0}/a.xml, {0}/b.xml\n\n"
+            "[broken]\n\n"
+            "[templated]\ntemplate = missing/template\n".format(self.folder))
+        index = pennyworth.dependencies.build_index(job_config)
+        self.assertEqual(index.get_job_chunks("plain"),
+                         {self._path("a.xml"), self._path("b.xml")})
+        self.assertEqual(sorted(index.get_failures()), ["broken", "templated"])
+        # a job whose template can't be loaded still depends on the template
+        self.assertEqual(index.get_template_jobs("missing/template"),
+                         {"templated"})
+
+    def test_template_overrides(self):
+        helpers.write_file(self.folder, "shared/templates.conf",
+                           "[basic]\nchunks = head.xml, build.xml, tail.xml\n")
+        job_config = helpers.make_job_configs(
+            self.folder,
+            "[standard]\ntemplate = shared/basic\n\n"
+            "[custom]\ntemplate = shared/basic\n"
+            "build.xml = {0}/custom.xml, {0}/extra.xml\n".format(self.folder))
+        index = pennyworth.dependencies.build_index(job_config)
+        self.assertEqual(index.get_failures(), {})
+        self.assertEqual(index.get_job_chunks("custom"), {
+            self._path("shared", "head.xml"), self._path("custom.xml"),
+            self._path("extra.xml"), self._path("shared", "tail.xml")})
+        # the overridden template chunk isn't one of the job's dependencies
+        self.assertEqual(
+            index.get_chunk_jobs(self._path("shared", "build.xml")),
+            {"standard"})
+        self.assertEqual(
+            index.get_chunk_jobs(self._path("shared", "head.xml")),
+            {"standard", "custom"})
+        self.assertEqual(index.get_chunk_jobs(self._path("custom.xml")),
+                         {"custom"})
+        self.assertEqual(
+            index.get_file_jobs(self._path("shared", "templates.conf")),
+            {"standard", "custom"})
+
+
+if __name__ == '__main__':
+    unittest.main()
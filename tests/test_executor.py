@@ -0,0 +1,162 @@
+#!/usr/bin/python3
+
+import types
+import unittest
+import unittest.mock
+
+import pennyworth.executor
+import pennyworth.host
+import pennyworth.sync
+
+
+def _host_error(status_code):
+    return pennyworth.host.HostError(types.SimpleNamespace(
+        url="http://jenkins/job/a", status_code=status_code, text="",
+        request=types.SimpleNamespace(method="POST")))
+
+
+class _Flaky:
+    # pylint: disable=too-few-public-methods
+    def __init__(self, *failures):
+        self.failures = list(failures)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+
+
+class TestRunOperations(unittest.TestCase):
+    def setUp(self):
+        patcher = unittest.mock.patch("time.sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _run(self, function, already_done=None, **kwargs):
+        operation = pennyworth.executor.Operation(
+            "create", "a", function, already_done=already_done)
+        return pennyworth.executor.run_operations([operation], **kwargs)[0]
+
+    def test_success(self):
+        function = _Flaky()
+        result = self._run(function)
+        self.assertTrue(result.succeeded())
+        self.assertEqual(result.attempts, 1)
+        self.sleep.assert_not_called()
+
+    def test_no_retries(self):
+        failure = Exception("broken")
+        result = self._run(_Flaky(failure))
+        self.assertIs(result.error, failure)
+        self.assertEqual(result.attempts, 1)
+
+    def test_retries_with_backoff(self):
+        function = _Flaky(Exception(), Exception())
+        result = self._run(function, retries=3, backoff=0.5)
+        self.assertTrue(result.succeeded())
+        self.assertEqual(result.attempts, 3)
+        self.assertEqual([call.args[0] for call in self.sleep.call_args_list],
+                         [0.5, 1.0])
+
+    def test_retries_run_out(self):
+        function = _Flaky(*[Exception()] * 5)
+        result = self._run(function, retries=2)
+        self.assertFalse(result.succeeded())
+        self.assertEqual(function.calls, 3)
+
+    def test_only_retryable_failures_are_retried(self):
+        function = _Flaky(ValueError(), KeyError())
+        result = self._run(
+            function, retries=5,
+            retryable=lambda failure: isinstance(failure, ValueError))
+        self.assertIsInstance(result.error, KeyError)
+        self.assertEqual(result.attempts, 2)
+
+    def test_already_done(self):
+        function = _Flaky(TimeoutError(), _host_error(400))
+        result = self._run(function, already_done=lambda failure: True,
+                           retries=2)
+        self.assertTrue(result.succeeded())
+        self.assertEqual(result.attempts, 2)
+
+    def test_already_done_only_checks_retries(self):
+        function = _Flaky(_host_error(400))
+        result = self._run(function, already_done=lambda failure: True,
+                           retries=2,
+                           retryable=pennyworth.host.is_transient_failure)
+        self.assertFalse(result.succeeded())
+        self.assertEqual(result.attempts, 1)
+
+    def test_results_keep_their_order(self):
+        operations = [pennyworth.executor.Operation(
+            "update", str(index), _Flaky(*[Exception()] * (index % 2)))
+                      for index in range(10)]
+        results = pennyworth.executor.run_operations(operations, workers=4)
+        self.assertEqual([result.operation.name for result in results],
+                         [str(index) for index in range(10)])
+        self.assertEqual([result.succeeded() for result in results],
+                         [index % 2 == 0 for index in range(10)])
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_unlimited(self):
+        with unittest.mock.patch("time.sleep") as sleep:
+            limiter = pennyworth.executor.RateLimiter()
+            for _ in range(5):
+                limiter.wait()
+        sleep.assert_not_called()
+
+    def test_spacing(self):
+        with unittest.mock.patch("time.monotonic", return_value=100.0), \
+                unittest.mock.patch("time.sleep") as sleep:
+            limiter = pennyworth.executor.RateLimiter(4)
+            for _ in range(3):
+                limiter.wait()
+        self.assertEqual([call.args[0] for call in sleep.call_args_list],
+                         [0.25, 0.5])
+
+
+class TestTransientFailures(unittest.TestCase):
+    def test_status_codes(self):
+        for status_code in [408, 429, 500, 502, 503, 504]:
+            self.assertTrue(pennyworth.host.is_transient_failure(
+                _host_error(status_code)))
+        for status_code in [400, 403, 404]:
+            self.assertFalse(pennyworth.host.is_transient_failure(
+                _host_error(status_code)))
+
+    def test_connection_problems(self):
+        # pylint: disable=import-outside-toplevel
+        import requests
+
+        for failure in [ConnectionError(), TimeoutError(),
+                        requests.ConnectionError(), requests.Timeout()]:
+            self.assertTrue(pennyworth.host.is_transient_failure(failure))
+        self.assertFalse(pennyworth.host.is_transient_failure(ValueError()))
+
+
+class TestSyncRetries(unittest.TestCase):
+    def _operations(self, host):
+        return pennyworth.sync._plan_jobs(  # pylint: disable=W0212
+            host, {"old": "<a/>"}, {"new": "<b/>"})[0]
+
+    def test_erase_already_done(self):
+        host = unittest.mock.Mock()
+        erase = next(operation for operation in self._operations(host)
+                     if operation.action == "erase")
+        self.assertTrue(erase.was_done(_host_error(404)))
+        self.assertFalse(erase.was_done(_host_error(500)))
+
+    def test_create_already_done(self):
+        host = unittest.mock.Mock()
+        create = next(operation for operation in self._operations(host)
+                      if operation.action == "create")
+        self.assertTrue(create.was_done(_host_error(400)))
+        host.get_job_config.side_effect = _host_error(404)
+        self.assertFalse(create.was_done(_host_error(400)))
+        self.assertFalse(create.was_done(_host_error(404)))
+
+
+if __name__ == '__main__':
+    unittest.main()
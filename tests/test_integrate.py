@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+
+import unittest
+
+import pennyworth.integrate
+import pennyworth.normalize
+
+
+class TestPlan(unittest.TestCase):
+    def setUp(self):
+        self.first = {
+            "same": "<a/>",
+            "changed": "<a>1</a>",
+            "removed": "<a/>",
+            "reformatted": "<a>\n  <b/>\n</a>"
+        }
+        self.second = {
+            "added": "<b/>",
+            "same": "<a/>",
+            "changed": "<a>2</a>",
+            "reformatted": "<a><b/></a>"
+        }
+
+    def test_sorting(self):
+        plan = pennyworth.integrate.Plan(self.first, self.second)
+        self.assertEqual(plan.unchanged, ["same"])
+        self.assertEqual(plan.changed, ["changed", "reformatted"])
+        self.assertEqual(plan.added, ["added"])
+        self.assertEqual(plan.removed, ["removed"])
+        self.assertEqual(len(plan), 5)
+
+    def test_key(self):
+        plan = pennyworth.integrate.Plan(
+            self.first, self.second, pennyworth.normalize.normalize_config)
+        self.assertEqual(plan.unchanged, ["same", "reformatted"])
+        self.assertEqual(plan.changed, ["changed"])
+
+    def test_differences(self):
+        plan = pennyworth.integrate.Plan(self.first, self.second)
+        self.assertEqual(list(plan.differences()), [
+            ("changed", "<a>1</a>", "<a>2</a>"),
+            ("removed", "<a/>", None),
+            ("reformatted", "<a>\n  <b/>\n</a>", "<a><b/></a>"),
+            ("added", None, "<b/>")
+        ])
+
+    def test_counts_and_sizes(self):
+        plan = pennyworth.integrate.Plan(self.first, self.second)
+        self.assertEqual(plan.get_counts(), {
+            "unchanged": 1, "changed": 2, "added": 1, "removed": 1})
+        self.assertEqual(plan.get_sizes(), {
+            "unchanged": 4, "changed": 19, "added": 4, "removed": 4})
+
+    def test_digests(self):
+        plan = pennyworth.integrate.Plan(self.first, self.second)
+        first, second = plan.get_digests("same")
+        self.assertEqual(first, second)
+        self.assertIsNone(plan.get_digests("added")[0])
+        self.assertIsNone(plan.get_digests("removed")[1])
+
+    def test_compare(self):
+        calls = []
+        pennyworth.integrate.compare(
+            self.first, self.second,
+            lambda *args: calls.append(args))
+        self.assertEqual([call[0] for call in calls],
+                         ["changed", "removed", "reformatted", "added"])
+
+
+if __name__ == '__main__':
+    unittest.main()
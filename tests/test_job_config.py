@@ -0,0 +1,147 @@
+#!/usr/bin/python3
+
+import tempfile
+import unittest
+
+import pennyworth.job_config
+
+import helpers
+
+
+class TestBuildConfig(unittest.TestCase):
+    def setUp(self):
+        self._folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self._folder.cleanup)
+
+    def _write(self, name, data):
+        return helpers.write_file(self._folder.name, name, data)
+
+    def _build(self, chunks, subs, strict=False):
+        return pennyworth.job_config.build_config(
+            chunks, pennyworth.job_config.ChunkCache(), subs, strict)
+
+    def test_slots(self):
+        # pylint: disable=protected-access
+        chunk = pennyworth.job_config._CompiledChunk("a@@ONE@@b@@TWO@@@@ONE@@")
+        self.assertEqual(chunk.parts, ["a", "ONE", "b", "TWO", "", "ONE", ""])
+        self.assertEqual(len(chunk), 23)
+
+    def test_no_tokens(self):
+        chunk = self._write("plain.xml", "<project/>")
+        self.assertEqual(self._build([chunk], {'NAME': "x"}), "<project/>")
+
+    def test_substitution(self):
+        head = self._write("head.xml", "<a>@@NAME@@</a>")
+        tail = self._write("tail.xml", "<b>@@NAME@@-@@OTHER@@</b>")
+        self.assertEqual(
+            self._build([head, tail], {'NAME': "job", 'OTHER': "x"}),
+            "<a>job</a><b>job-x</b>")
+
+    def test_values_are_not_rescanned(self):
+        chunk = self._write("chunk.xml", "@@FIRST@@")
+        self.assertEqual(
+            self._build([chunk], {'FIRST': "@@SECOND@@", 'SECOND': "no"}),
+            "@@SECOND@@")
+
+    def test_unresolved(self):
+        chunk = self._write("chunk.xml", "<a>@@MISSING@@</a>")
+        self.assertEqual(self._build([chunk], {}), "<a>@@MISSING@@</a>")
+
+    def test_unresolved_strict(self):
+        chunk = self._write("chunk.xml", "<a>@@MISSING@@</a>")
+        with self.assertRaises(
+                pennyworth.job_config.UnresolvedSubstitutionError) as context:
+            self._build([chunk], {}, strict=True)
+        self.assertEqual(context.exception.tokens, ["MISSING"])
+
+    def test_chunks_compiled_once(self):
+        chunk = self._write("chunk.xml", "@@NAME@@")
+        cache = pennyworth.job_config.ChunkCache()
+        for name in ["a", "b", "c"]:
+            self.assertEqual(pennyworth.job_config.build_config(
+                [chunk], cache, {'NAME': name}), name)
+        stats = cache.get_stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 2)
+
+
+class TestChunkCache(unittest.TestCase):
+    def test_unbounded(self):
+        cache = pennyworth.job_config.ChunkCache()
+        cache.set("a", "x" * 100)
+        cache.set("b", "y" * 100)
+        self.assertEqual(cache.get("a"), "x" * 100)
+        self.assertEqual(cache.get("missing", "fallback"), "fallback")
+        self.assertEqual(cache.get_stats()['bytes'], 200)
+
+    def test_evicts_least_recently_used(self):
+        cache = pennyworth.job_config.ChunkCache(max_bytes=20)
+        cache.set("a", "a" * 10)
+        cache.set("b", "b" * 10)
+        cache.get("a")
+        cache.set("c", "c" * 10)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "a" * 10)
+        self.assertEqual(cache.get("c"), "c" * 10)
+        stats = cache.get_stats()
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['bytes'], 20)
+
+    def test_oversized_entries_are_not_cached(self):
+        cache = pennyworth.job_config.ChunkCache(max_bytes=5)
+        cache.set("a", "a" * 10)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get_stats()['bytes'], 0)
+
+    def test_replacing_an_entry(self):
+        cache = pennyworth.job_config.ChunkCache(max_bytes=20)
+        cache.set("a", "a" * 10)
+        cache.set("a", "b" * 15)
+        self.assertEqual(cache.get("a"), "b" * 15)
+        self.assertEqual(cache.get_stats()['bytes'], 15)
+
+    def test_revalidate(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = helpers.write_file(folder, "chunk.xml", "old")
+            cache = pennyworth.job_config.ChunkCache(revalidate=True)
+            cache.set(path, "old")
+            self.assertEqual(cache.get(path), "old")
+            helpers.write_file(folder, "chunk.xml", "newer")
+            self.assertIsNone(cache.get(path))
+            self.assertEqual(cache.get_stats()['invalidations'], 1)
+
+    def test_change_while_reading(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = helpers.write_file(folder, "chunk.xml", "old")
+            cache = pennyworth.job_config.ChunkCache(revalidate=True)
+            signature = cache.get_signature(path)
+            # the file changes after it was read but before it's cached
+            helpers.write_file(folder, "chunk.xml", "newer")
+            cache.set(path, "old", signature)
+            self.assertIsNone(cache.get(path))
+            self.assertEqual(
+                pennyworth.job_config.build_config([path], cache, {}),
+                "newer")
+
+
+class TestIterJobConfigs(unittest.TestCase):
+    def test_parallel_matches_serial(self):
+        with tempfile.TemporaryDirectory() as folder:
+            chunk = helpers.write_file(folder, "chunk.xml",
+                                       "<name>@@NAME@@</name>")
+            job_config = helpers.make_job_configs(folder, "".join(
+                "[job{0}]\nchunks = {1}\nsub.name = {0}\n".format(
+                    index, chunk) for index in range(300)))
+            jobs = job_config.get_jobs()
+            serial = list(pennyworth.job_config.iter_job_configs(
+                job_config, jobs))
+            parallel = list(pennyworth.job_config.iter_job_configs(
+                job_config, jobs, processes=2))
+        self.assertEqual(len(serial), 300)
+        self.assertEqual(serial, parallel)
+        self.assertEqual(serial[7], ("job7", "<name>7</name>"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+
+import os
+import tempfile
+import unittest
+
+import pennyworth.job_filter
+
+import helpers
+
+_JOBS_CONF = """
+[DEFAULT]
+common = {folder}/common.xml
+
+[team-a]
+chunks = ${{common}}, {folder}/a.xml
+
+[team-b]
+chunks = ${{common}}, {folder}/b.xml
+
+[other]
+chunks = {folder}/b.xml
+
+[templated]
+template = shared/basic
+"""
+
+
+class TestSelectJobs(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        helpers.use_config_root(self, self.folder)
+        helpers.write_file(self.folder, "shared/templates.conf",
+                           "[basic]\nchunks = head.xml\n")
+        self.job_config = helpers.make_job_configs(
+            self.folder, _JOBS_CONF.format(folder=self.folder))
+
+    def _select(self, *patterns, templates=(), chunks=()):
+        return pennyworth.job_filter.select_jobs(self.job_config, patterns,
+                                                 templates, chunks)
+
+    def test_nothing(self):
+        self.assertEqual(self._select(), [])
+
+    def test_names_keep_their_order(self):
+        self.assertEqual(self._select("other", "team-a"), ["other", "team-a"])
+
+    def test_unknown_name(self):
+        with self.assertRaisesRegex(Exception, "missing is not a valid job"):
+            self._select("missing")
+
+    def test_glob(self):
+        self.assertEqual(self._select("team-*"), ["team-a", "team-b"])
+
+    def test_regex(self):
+        self.assertEqual(self._select("re:^(other|team-b)$"),
+                         ["team-b", "other"])
+
+    def test_no_matches(self):
+        with self.assertRaisesRegex(Exception, "doesn't match any jobs"):
+            self._select("nothing-*")
+
+    def test_duplicates(self):
+        self.assertEqual(self._select("team-b", "team-*"),
+                         ["team-b", "team-a"])
+
+    def test_template(self):
+        self.assertEqual(self._select(templates=["shared/basic"]),
+                         ["templated"])
+
+    def test_chunk(self):
+        self.assertEqual(
+            self._select(chunks=[os.path.join(self.folder, "b.xml")]),
+            ["team-b", "other"])
+        self.assertEqual(
+            self._select(chunks=[os.path.join(self.folder, "common.xml")]),
+            ["team-a", "team-b"])
+
+    def test_unused_template(self):
+        with self.assertRaisesRegex(Exception,
+                                    "No jobs use template shared/other"):
+            self._select(templates=["shared/basic", "shared/other"])
+
+    def test_unused_chunk(self):
+        with self.assertRaisesRegex(Exception, "No jobs are built from"):
+            self._select(chunks=[os.path.join(self.folder, "missing.xml")])
+
+    def test_unresolved_chunks(self):
+        job_config = helpers.make_job_configs(
+            self.folder, _JOBS_CONF.format(folder=self.folder) +
+            "\n[broken]\ntemplate = shared/missing\n")
+        # broken's chunks are unknown, so it could be built from a.xml
+        with self.assertRaisesRegex(Exception,
+                                    "Failed to resolve chunks for broken"):
+            pennyworth.job_filter.select_jobs(
+                job_config, chunks=[os.path.join(self.folder, "a.xml")])
+
+    def test_combined(self):
+        self.assertEqual(
+            self._select("other", templates=["shared/basic"],
+                         chunks=[os.path.join(self.folder, "a.xml")]),
+            ["other", "team-a", "templated"])
+
+
+if __name__ == '__main__':
+    unittest.main()
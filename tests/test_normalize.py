@@ -0,0 +1,43 @@
+#!/usr/bin/python3
+
+import unittest
+
+import pennyworth.normalize
+
+
+class TestNormalizeConfig(unittest.TestCase):
+    def _assert_same(self, first, second):
+        self.assertEqual(pennyworth.normalize.normalize_config(first),
+                         pennyworth.normalize.normalize_config(second))
+
+    def test_line_endings(self):
+        self._assert_same("<project>\r\n<a>1</a>\r\n</project>",
+                          "<project>\n<a>1</a>\n</project>")
+
+    def test_declaration(self):
+        self._assert_same(
+            "<?xml version='1.1' encoding='UTF-8'?>\n<project/>",
+            "<project></project>")
+
+    def test_attribute_order(self):
+        self._assert_same('<project a="1" b="2"/>', '<project b="2" a="1"/>')
+
+    def test_whitespace(self):
+        self._assert_same("<project>\n  <a>  1 </a>\n</project>",
+                          "<project><a>1</a></project>")
+
+    def test_different_text(self):
+        self.assertNotEqual(
+            pennyworth.normalize.normalize_config("<project><a>1</a>"
+                                                  "</project>"),
+            pennyworth.normalize.normalize_config("<project><a>2</a>"
+                                                  "</project>"))
+
+    def test_malformed(self):
+        self.assertEqual(
+            pennyworth.normalize.normalize_config("  <project>\r\n"),
+            "<project>")
+
+
+if __name__ == '__main__':
+    unittest.main()
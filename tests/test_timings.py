@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+
+import io
+import unittest
+
+import pennyworth.timings
+
+
+class TestTimings(unittest.TestCase):
+    def setUp(self):
+        # pylint: disable=protected-access
+        enabled = pennyworth.timings._STATE['enabled']
+        self.addCleanup(pennyworth.timings._STATE.__setitem__, 'enabled',
+                        enabled)
+        self.addCleanup(pennyworth.timings.reset)
+        pennyworth.timings._STATE['enabled'] = False
+        pennyworth.timings.reset()
+
+    def test_disabled(self):
+        with pennyworth.timings.phase("block"):
+            pass
+        pennyworth.timings.count("counter")
+        self.assertEqual(
+            pennyworth.timings.timed("call")(lambda value: value)(3), 3)
+        self.assertEqual(pennyworth.timings.get_phases(), {})
+        self.assertEqual(pennyworth.timings.get_counters(), {})
+
+    def test_enabled(self):
+        pennyworth.timings.enable()
+        for _ in range(2):
+            with pennyworth.timings.phase("block"):
+                pass
+        pennyworth.timings.count("counter")
+        pennyworth.timings.count("counter", 4)
+        self.assertEqual(
+            pennyworth.timings.timed("call")(lambda value: value)(3), 3)
+        phases = pennyworth.timings.get_phases()
+        self.assertEqual(phases["block"][0], 2)
+        self.assertEqual(phases["call"][0], 1)
+        self.assertEqual(pennyworth.timings.get_counters(), {"counter": 5})
+
+    def test_failures_are_timed(self):
+        pennyworth.timings.enable()
+        with self.assertRaises(ValueError):
+            with pennyworth.timings.phase("block"):
+                raise ValueError()
+        self.assertEqual(pennyworth.timings.get_phases()["block"][0], 1)
+
+    def test_generator(self):
+        @pennyworth.timings.timed("items")
+        def _items():
+            yield from range(3)
+
+        pennyworth.timings.enable()
+        self.assertEqual(list(_items()), [0, 1, 2])
+        generator = _items()
+        next(generator)
+        generator.close()
+        # each generator is recorded once, however many items it produced
+        self.assertEqual(pennyworth.timings.get_phases()["items"][0], 2)
+
+    def test_reset(self):
+        pennyworth.timings.enable()
+        pennyworth.timings.count("counter")
+        pennyworth.timings.add_time("block", 1.5)
+        pennyworth.timings.reset()
+        self.assertEqual(pennyworth.timings.get_phases(), {})
+        self.assertEqual(pennyworth.timings.get_counters(), {})
+
+    def test_report(self):
+        pennyworth.timings.enable()
+        pennyworth.timings.add_time("block", 1.5)
+        pennyworth.timings.count("cache.hits", 3)
+        pennyworth.timings.count("cache.misses")
+        pennyworth.timings.count("other.misses")
+        output = io.StringIO()
+        pennyworth.timings.print_report(output)
+        lines = [line.split() for line in output.getvalue().splitlines()]
+        self.assertIn(["block", "1", "1.500"], lines)
+        self.assertIn(["cache.hits", "3"], lines)
+        self.assertIn(["cache", "75.0%"], lines)
+        self.assertIn(["other", "0.0%"], lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
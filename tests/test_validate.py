@@ -0,0 +1,132 @@
+#!/usr/bin/python3
+
+import difflib
+import random
+import re
+import unittest
+
+import pennyworth.validate
+
+
+def _unified_diff(first, second):
+    return list(difflib.unified_diff(
+        first.split('\n') if first else [],
+        second.split('\n') if second else [],
+        "jenkins/job", "generated/job"))
+
+
+_HUNK_PATTERN = re.compile(R"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@$")
+
+
+def _random_edit(generator, lines):
+    lines = list(lines)
+    for _ in range(generator.randint(1, 3)):
+        position = generator.randint(0, len(lines))
+        action = generator.choice(["insert", "delete", "replace"])
+        if action == "insert" or position == len(lines):
+            lines.insert(position, generator.choice("abcdeQ"))
+        elif action == "delete":
+            del lines[position]
+        else:
+            lines[position] = generator.choice("abcdeQ")
+    return lines
+
+
+class TestDiffLines(unittest.TestCase):
+    def _assert_matches_difflib(self, first, second):
+        self.assertEqual(
+            pennyworth.validate._diff_lines(  # pylint: disable=W0212
+                "job", first, second, "jenkins"),
+            _unified_diff(first, second))
+
+    def test_identical(self):
+        self._assert_matches_difflib("a\nb\nc", "a\nb\nc")
+
+    def test_added_and_removed(self):
+        self._assert_matches_difflib("", "a\nb")
+        self._assert_matches_difflib("a\nb", "")
+
+    def test_edit_near_the_end(self):
+        self._assert_matches_difflib(
+            "\n".join("e d e b e d b e a d e c d a c b b a c a a c".split()),
+            "\n".join("e Q e b e d b e a d e c d e a c b a c a a c".split()))
+
+    def test_declaration(self):
+        body = ["<a>{}</a>".format(index) for index in range(20)]
+        self._assert_matches_difflib(
+            "\n".join(["<?xml version='1.1' encoding='UTF-8'?>"] + body),
+            "\n".join(["<?xml version='1.0' encoding='UTF-8'?>"] + body[:10] +
+                      ["<b/>"] + body[11:]))
+
+    def test_random_unique_lines(self):
+        # without repeated lines there's only one sensible diff, so the
+        # output should be exactly what difflib produces
+        generator = random.Random(1)
+        for _ in range(500):
+            first = [str(line) for line in
+                     generator.sample(range(1000), generator.randint(0, 30))]
+            second = []
+            for line in first:
+                action = generator.random()
+                if action < 0.1:
+                    continue
+                if action < 0.2:
+                    second.append("new{}".format(len(second)))
+                second.append(line)
+            self._assert_matches_difflib("\n".join(first), "\n".join(second))
+
+    def test_random_edits(self):
+        # with repeated lines the matches can legitimately differ from
+        # difflib's, but every hunk still needs full context and applying
+        # them has to produce the generated configuration
+        generator = random.Random(1)
+        for _ in range(1000):
+            first = [generator.choice("abcde")
+                     for _ in range(generator.randint(0, 30))]
+            second = _random_edit(generator, first)
+            diff = pennyworth.validate._diff_lines(  # pylint: disable=W0212
+                "job", "\n".join(first), "\n".join(second), "jenkins")
+            self.assertEqual(bool(diff), first != second)
+            self.assertEqual(self._apply(first, diff[2:]), second)
+
+    def _apply(self, first, hunks):
+        result = []
+        position = 0
+        index = 0
+        while index < len(hunks):
+            match = _HUNK_PATTERN.match(hunks[index].rstrip('\n'))
+            self.assertIsNotNone(match)
+            old_length = int(match.group(2) or 1)
+            new_length = int(match.group(4) or 1)
+            start = int(match.group(1)) - (1 if old_length else 0)
+            body = []
+            index += 1
+            while index < len(hunks) and not hunks[index].startswith("@@"):
+                body.append(hunks[index])
+                index += 1
+            self.assertEqual(old_length,
+                             sum(1 for line in body if line[0] in " -"))
+            self.assertEqual(new_length,
+                             sum(1 for line in body if line[0] in " +"))
+            # patch treats a hunk with less context as the start or end of
+            # the file
+            leading = next(count for count, line in enumerate(body)
+                           if line[0] != " ")
+            trailing = next(count for count, line in enumerate(reversed(body))
+                            if line[0] != " ")
+            self.assertTrue(leading == 3 or start == 0)
+            self.assertTrue(trailing == 3 or
+                            start + old_length == len(first))
+            result.extend(first[position:start])
+            position = start
+            for line in body:
+                if line[0] in " -":
+                    self.assertEqual(first[position], line[1:])
+                    position += 1
+                if line[0] in " +":
+                    result.append(line[1:])
+        result.extend(first[position:])
+        return result
+
+if __name__ == '__main__':
+    unittest.main()